@@ -1,22 +1,206 @@
-from flask import Flask, render_template, redirect, url_for, request, jsonify, abort, flash
+from flask import Flask, Response, send_file, render_template, redirect, url_for, request, jsonify, abort, flash, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from datetime import datetime
+from database import configure_database, begin_write_transaction, sync_id_sequences
+from cache import ResponseCache, GLOBAL_TAG
+from instrumentation import RequestMetrics
+from assets import Assets
+from serializers import configure_json, serialize_task, serialize_list, serialize_rows, row_serializer, TASK_SCHEMA, LIST_SCHEMA, EXPORT_TASK_SCHEMA
+import click
+from sqlalchemy import select, insert, update, func, case, tuple_
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
+from werkzeug.exceptions import HTTPException
+from datetime import datetime, date, timedelta
+from itertools import islice
+from urllib.parse import urlencode
+import base64
+import gzip
+import json
 import os
+import time
 
 app = Flask(__name__, static_folder='assets')
 app.json.sort_keys = False
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev_key') # Secret key for flash sessions and other stuff
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tasks.db'
+configure_database(app) # Database URL, pool size and SQLite pragmas from the environment
+app.config['IMPORT_CHUNK_SIZE'] = int(os.environ.get('IMPORT_CHUNK_SIZE', 500)) # Lists per import transaction
+app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', 1000)) # Rows fetched per cursor batch when exporting
+app.config['API_MAX_PAGE_SIZE'] = int(os.environ.get('API_MAX_PAGE_SIZE', 1000)) # Upper bound for the limit parameter
+app.config['SEARCH_PAGE_SIZE'] = int(os.environ.get('SEARCH_PAGE_SIZE', 20)) # Default number of search results per page
+app.config['AGENDA_BUCKET_SIZE'] = int(os.environ.get('AGENDA_BUCKET_SIZE', 20)) # Tasks shown per agenda bucket
+app.config['AGENDA_PAGE_SIZE'] = int(os.environ.get('AGENDA_PAGE_SIZE', 100)) # Tasks per page when the agenda page shows a single bucket
+app.config['BATCH_MAX_OPERATIONS'] = int(os.environ.get('BATCH_MAX_OPERATIONS', 5000)) # Operations accepted by /api/tasks/batch
+app.config['PERF_SLOW_REQUEST_MS'] = float(os.environ.get('PERF_SLOW_REQUEST_MS', 500)) # Log requests slower than this
+app.config['PERF_SLOW_QUERY_MS'] = float(os.environ.get('PERF_SLOW_QUERY_MS', 100)) # Log SQL statements slower than this
+app.config['PERF_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('PERF_N_PLUS_ONE_THRESHOLD', 20)) # Warn when one statement repeats more often in a request
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory') # memory, redis, none or module:Class
+app.config['CACHE_DEFAULT_TTL'] = int(os.environ.get('CACHE_DEFAULT_TTL', 60)) # Seconds a cached response stays valid
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1024)) # LRU limit of the in-process backend
+app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0') # Shared backend for multi-worker deployments
+app.config['JSON_BACKEND'] = os.environ.get('JSON_BACKEND', 'auto') # orjson, json or auto (orjson when installed)
+configure_json(app)
+app.config['CHANGES_MAX_ROWS'] = int(os.environ.get('CHANGES_MAX_ROWS', 5000)) # Rows per /api/changes response
+app.config['CHANGES_MAX_WAIT'] = float(os.environ.get('CHANGES_MAX_WAIT', 30)) # Longest long-poll wait in seconds
+app.config['CHANGES_POLL_INTERVAL'] = float(os.environ.get('CHANGES_POLL_INTERVAL', 1)) # How often long-polls check for commits from other processes
+app.config['ASSETS_EXTRA_ICONS'] = os.environ.get('ASSETS_EXTRA_ICONS', '') # Comma separated icons to add to the sprite besides those found in templates
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2)) # Background job threads per process
+app.config['JOB_DIR'] = os.environ.get('JOB_DIR', os.path.join(app.instance_path, 'jobs')) # Uploads and export files of background jobs
+app.config['JOB_PROGRESS_INTERVAL'] = float(os.environ.get('JOB_PROGRESS_INTERVAL', 0.5)) # Seconds between progress writes
+app.config['JOB_EXPORT_COMPRESSLEVEL'] = int(os.environ.get('JOB_EXPORT_COMPRESSLEVEL', 6)) # gzip level of export files
+app.config['JOB_HEARTBEAT_INTERVAL'] = float(os.environ.get('JOB_HEARTBEAT_INTERVAL', 10)) # Seconds between heartbeats of queued and running jobs
+app.config['JOB_STALE_AFTER'] = float(os.environ.get('JOB_STALE_AFTER', 60)) # Jobs without a heartbeat for this long are marked failed
+app.config['SNAPSHOT_ZSTD_LEVEL'] = int(os.environ.get('SNAPSHOT_ZSTD_LEVEL', 3)) # zstd level of database snapshots
+app.config['SNAPSHOT_GZIP_LEVEL'] = int(os.environ.get('SNAPSHOT_GZIP_LEVEL', 6)) # gzip level of database snapshots without zstandard
 db = SQLAlchemy(app)
 
 # Allow CORS only from a specific domain (e.g., localhost:3000)
 CORS(app)
 
-from models import Task, List
+cache = ResponseCache(app) # Response cache for the read-heavy GET views, see cache.py
+metrics = RequestMetrics(app) # Query counts, Server-Timing headers, slow request log and /metrics
+assets = Assets(app) # Icon sprite and other fingerprinted, precompressed assets under /assets/dist
 
-def get_all_lists():
-    return List.query.all()
+from models import Task, List, Job
+from jsonstream import iter_lists, iter_columnar, is_columnar, JSONStreamError, FORMATS as IMPORT_FORMATS
+import search
+import migrations
+import datagen
+import jobs
+import changes
+import snapshot
+
+IMPORT_MODES = ('insert', 'upsert')
+EXPORT_FORMATS = ('json', 'ndjson', 'columnar')
+EXPORT_MIMETYPES = {'json': 'application/json', 'ndjson': 'application/x-ndjson', 'columnar': 'application/json'}
+TASK_FIELDS = TASK_SCHEMA
+LIST_FIELDS = LIST_SCHEMA + ('task_count', 'completed_count', 'overdue_count')
+DEFAULT_TASK_FIELDS = ('id', 'title', 'due_date', 'status')
+TASK_ORDERS = ('id', 'due_date')
+BATCH_OPERATIONS = ('create', 'update', 'complete', 'uncomplete', 'delete')
+AGENDA_BUCKETS = ('overdue', 'today', 'this_week', 'later')
+
+def _list_count_columns():
+    return {
+        'task_count': func.count(Task.id).label('task_count'),
+        'completed_count': func.coalesce(func.sum(case((Task.status == True, 1), else_=0)), 0).label('completed_count'),
+        'overdue_count': func.coalesce(func.sum(case(((Task.status == False) & (Task.due_date < date.today()), 1), else_=0)), 0).label('overdue_count')
+    }
+
+def list_summaries_query():
+    # Total, completed and overdue task counts for every list in one GROUP BY
+    # query, instead of a count(*) per list through List.task_count
+    return (
+        select(List, *_list_count_columns().values())
+        .outerjoin(Task, Task.list_id == List.id)
+        .group_by(List.id)
+        .order_by(List.id)
+    )
+
+def get_list_summaries():
+    return db.session.execute(list_summaries_query()).all()
+
+def query_lists(fields=LIST_FIELDS, limit=None, cursor=None):
+    # Keyset pagination on id. Returns the page of rows and the key of its last
+    # row when there are more.
+    return _fetch_page(lists_query(fields, cursor), limit, lambda row: [row._key_id])
+
+def lists_query(fields=LIST_FIELDS, cursor=None):
+    # The task counts are only joined in when requested
+    count_columns = _list_count_columns()
+    columns = [count_columns[field] if field in count_columns else getattr(List, field) for field in fields]
+    query = select(*columns, List.id.label('_key_id')).order_by(List.id)
+    if any(field in count_columns for field in fields):
+        query = query.outerjoin(Task, Task.list_id == List.id).group_by(List.id)
+    if cursor:
+        query = query.where(List.id > cursor[0])
+    return query
+
+def query_tasks(fields=TASK_FIELDS, status=None, due_before=None, due_after=None, list_id=None, order='id', limit=None, cursor=None):
+    # Keyset pagination on id or (due_date, id)
+    def key(row):
+        return [row._key_due_date.isoformat(), row._key_id] if order == 'due_date' else [row._key_id]
+    return _fetch_page(tasks_query(fields, status, due_before, due_after, list_id, order, cursor), limit, key)
+
+def tasks_query(fields=TASK_FIELDS, status=None, due_before=None, due_after=None, list_id=None, order='id', cursor=None):
+    # Selects only the requested columns plus the keyset columns
+    key_columns = [Task.due_date.label('_key_due_date'), Task.id.label('_key_id')] if order == 'due_date' else [Task.id.label('_key_id')]
+    query = select(*[getattr(Task, field) for field in fields], *key_columns)
+    if status is not None:
+        query = query.where(Task.status == status)
+    if due_before is not None:
+        query = query.where(Task.due_date < due_before)
+    if due_after is not None:
+        query = query.where(Task.due_date > due_after)
+    if list_id is not None:
+        query = query.where(Task.list_id == list_id)
+    if cursor:
+        if order == 'due_date':
+            query = query.where(tuple_(Task.due_date, Task.id) > tuple_(date.fromisoformat(cursor[0]), cursor[1]))
+        else:
+            query = query.where(Task.id > cursor[0])
+    return query.order_by(Task.due_date, Task.id) if order == 'due_date' else query.order_by(Task.id)
+
+def _fetch_page(query, limit, key):
+    if limit is None:
+        return db.session.execute(query).all(), None
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, key(rows[-1])
+    return rows, None
+
+def agenda_ranges(today):
+    # Exclusive (due_after, due_before) bounds of every bucket. The week ends on
+    # Sunday, so on Sundays this_week is empty.
+    week_end = today + timedelta(days=6 - today.weekday())
+    return {
+        'overdue': (None, today),
+        'today': (today - timedelta(days=1), today + timedelta(days=1)),
+        'this_week': (today, week_end + timedelta(days=1)),
+        'later': (week_end, None)
+    }
+
+def agenda_counts_query(today):
+    # Open tasks per bucket as one sum per bucket, a single pass over the
+    # (status, due_date) index without the sort a GROUP BY would need
+    week_end = agenda_ranges(today)['later'][0]
+    conditions = {
+        'overdue': Task.due_date < today,
+        'today': Task.due_date == today,
+        'this_week': (Task.due_date > today) & (Task.due_date <= week_end),
+        'later': Task.due_date > week_end
+    }
+    return select(*[func.coalesce(func.sum(case((conditions[bucket], 1), else_=0)), 0).label(bucket) for bucket in AGENDA_BUCKETS]).where(Task.status == False)
+
+def get_agenda_counts(today):
+    return dict(db.session.execute(agenda_counts_query(today)).one()._mapping)
+
+def agenda_bucket_query(bucket, today, cursor=None):
+    # Open tasks of one bucket ordered by (due_date, id), each a range scan on
+    # the (status, due_date) index, with the title of their list
+    due_after, due_before = agenda_ranges(today)[bucket]
+    return (
+        tasks_query(TASK_FIELDS, status=False, due_before=due_before, due_after=due_after, order='due_date', cursor=cursor)
+        .join(List, List.id == Task.list_id)
+        .add_columns(List.title.label('list_title'))
+    )
+
+def query_agenda_bucket(bucket, today, limit, cursor=None):
+    rows, next_key = _fetch_page(agenda_bucket_query(bucket, today, cursor), limit, lambda row: [row._key_due_date.isoformat(), row._key_id])
+    serialize = row_serializer(TASK_FIELDS)
+    return [dict(serialize(row), list_title=row.list_title) for row in rows], next_key
+
+def get_agenda(today, limit):
+    counts = get_agenda_counts(today)
+    buckets = {}
+    for bucket in AGENDA_BUCKETS:
+        tasks, next_key = query_agenda_bucket(bucket, today, limit) if counts[bucket] else ([], None)
+        buckets[bucket] = {'count': counts[bucket], 'tasks': tasks, 'next_cursor': _encode_cursor(next_key) if next_key else None}
+    return {'date': today.isoformat(), 'week_end': agenda_ranges(today)['later'][0].isoformat(), 'total': sum(counts.values()), 'buckets': buckets}
+
+def _agenda_tags():
+    # The date in a tag makes cached agendas roll over at midnight
+    return ['lists', 'tasks', f'agenda:{date.today().isoformat()}']
 
 def get_list_by_id(list_id):
     list = List.query.get(list_id)
@@ -30,6 +214,7 @@ def create_list(data):
     new_list = List(title=data['title'], description=data['description'], created_date=datetime.strptime(datetime.today().strftime('%Y-%m-%d'), '%Y-%m-%d').date())
     db.session.add(new_list)
     db.session.commit()
+    cache.invalidate('lists')
     return new_list
 
 def update_list(list, data):
@@ -41,25 +226,19 @@ def update_list(list, data):
         list.description = data.get('description', list.description)
     
     db.session.commit()
+    cache.invalidate('lists', f'list:{list.id}')
     return list
 
 def delete_list(list):
+    list_id = list.id
     try:
         db.session.delete(list)
         db.session.commit()
-        return True
     except:
+        db.session.rollback()
         return False
-
-def get_all_tasks():
-    return Task.query.all()
-
-def get_tasks_by_list_id(list_id):
-    try: 
-        tasks = Task.query.filter_by(list_id=list_id).all()
-        return tasks
-    except:
-        return None
+    cache.invalidate('lists', f'list:{list_id}', f'list:{list_id}:tasks')
+    return True
 
 def get_task_by_id(task_id):
     task = Task.query.get(task_id)
@@ -67,7 +246,7 @@ def get_task_by_id(task_id):
         abort(404)
     return task
 
-def create_task(data):
+def create_task(data, commit=True):
     if not data or not 'title' in data or not 'due_date' in data or not 'list_id' in data:
         abort(400, description="Bad request, title, due_date, and list_id are required")
 
@@ -79,10 +258,10 @@ def create_task(data):
         status=False
     )
     db.session.add(new_task)
-    db.session.commit()
+    _save(new_task.list_id, commit)
     return new_task
 
-def update_task(task, data):
+def update_task(task, data, commit=True):
     if not data:
         abort(400, description="Bad request, data is required")
 
@@ -90,91 +269,389 @@ def update_task(task, data):
     if 'due_date' in data:
         task.due_date = datetime.strptime(data['due_date'], '%Y-%m-%d').date()
 
-    db.session.commit()
+    _save(task.list_id, commit)
     return task
 
-def complete_task(task):
+def complete_task(task, commit=True):
     task.status = True
-    db.session.commit()
+    _save(task.list_id, commit)
     return task
 
-def uncomplete_task(task):
+def uncomplete_task(task, commit=True):
     task.status = False
-    db.sesson.commit()
+    _save(task.list_id, commit)
     return task
 
-def delete_task(task):
+def delete_task(task, commit=True):
     db.session.delete(task)
-    db.session.commit()
+    _save(task.list_id, commit)
     return True
 
-def import_data_from_json(data):
+def _save(list_id, commit):
+    # Without commit the change is only flushed, so the caller can group several
+    # task changes in one transaction (see apply_task_batch)
+    if commit:
+        db.session.commit()
+        _invalidate_tasks(list_id)
+    else:
+        db.session.flush()
+
+def _invalidate_tasks(list_id):
+    # Task changes also change the per-list counts shown with the lists
+    cache.invalidate('lists', 'tasks', f'list:{list_id}:tasks')
+
+def apply_task_batch(operations, atomic=True):
+    # Applies create/update/complete/uncomplete/delete operations with a single
+    # lookup for all referenced tasks and a single commit. In atomic mode the first
+    # failing operation rolls everything back; otherwise each operation runs in a
+    # savepoint and failures are only reported in its result.
+    if not operations or not isinstance(operations, list) or not all(isinstance(operation, dict) for operation in operations):
+        abort(400, description="Bad request, operations must be a list of objects")
+    if len(operations) > app.config['BATCH_MAX_OPERATIONS']:
+        abort(400, description=f"Bad request, at most {app.config['BATCH_MAX_OPERATIONS']} operations per batch")
+
+    ids = {operation.get('id') for operation in operations if isinstance(operation.get('id'), int)}
+    tasks = {}
+    for batch in _chunked(list(ids), 900):
+        tasks.update((task.id, task) for task in Task.query.filter(Task.id.in_(batch)))
+
+    results = []
+    list_ids = set()
+    if not atomic:
+        begin_write_transaction(db.session.connection())
+    for index, operation in enumerate(operations):
+        savepoint = None if atomic else db.session.begin_nested()
+        try:
+            status, task = _apply_task_operation(operation, tasks)
+        except (HTTPException, ValueError, TypeError, SQLAlchemyError) as e:
+            if isinstance(e, HTTPException):
+                code, error = e.code, e.description
+            else:
+                # Database errors report the driver's message, not SQLAlchemy's wrapper
+                code, error = 400, f"Bad request, {getattr(e, 'orig', None) or e}"
+            results.append({'index': index, 'op': operation.get('op'), 'status': code, 'error': error})
+            if atomic:
+                db.session.rollback()
+                return {'committed': False, 'results': results}
+            savepoint.rollback()
+            continue
+        if savepoint is not None:
+            savepoint.commit()
+        list_ids.add(task['list_id'])
+        results.append({'index': index, 'op': operation['op'], 'status': status, 'task': task})
+
+    db.session.commit()
+    for list_id in list_ids:
+        _invalidate_tasks(list_id)
+    return {'committed': True, 'results': results}
+
+def _apply_task_operation(operation, tasks):
+    op = operation.get('op')
+    if op not in BATCH_OPERATIONS:
+        abort(400, description=f"Bad request, op must be one of: {', '.join(BATCH_OPERATIONS)}")
+    if op in ('create', 'update') and not isinstance(operation.get('data'), dict):
+        abort(400, description="Bad request, data must be an object")
+    if op == 'create':
+        task = create_task(operation.get('data'), commit=False)
+        tasks[task.id] = task
+        return 201, serialize_task(task)
+
+    task = tasks.get(operation.get('id')) if isinstance(operation.get('id'), int) else None
+    if task is None:
+        abort(404, description=f"Task {operation.get('id')} not found")
+    if op == 'update':
+        update_task(task, operation.get('data'), commit=False)
+    elif op == 'complete':
+        complete_task(task, commit=False)
+    elif op == 'uncomplete':
+        uncomplete_task(task, commit=False)
+    elif op == 'delete':
+        data = serialize_task(task)
+        delete_task(task, commit=False)
+        del tasks[task.id]
+        return 204, data
+    return 200, serialize_task(task)
+
+def run_search(query, type, limit, offset):
+    # Fetches one extra row per kind to tell whether another page exists
+    results = {}
+    for kind, search_function in (('tasks', search.search_tasks), ('lists', search.search_lists)):
+        if type in ('all', kind):
+            rows = search_function(query, limit + 1, offset)
+            results[kind] = rows[:limit]
+            if len(rows) > limit:
+                results[f'next_{kind}_offset'] = offset + limit
+    return results
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _existing_ids(model, ids):
+    # One IN (...) query per batch of ids instead of one lookup per row,
+    # kept under SQLite's bound parameter limit
+    existing = set()
+    for batch in _chunked(ids, 900):
+        existing.update(db.session.execute(select(model.id).where(model.id.in_(batch))).scalars())
+    return existing
+
+def _parse_date(value):
+    # Much cheaper than strptime when called for every imported row
+    return date.fromisoformat(value)
+
+def _field(data, name, type):
+    # Required, non-null and of the column's type, so bad rows are rejected
+    # before they reach the database
+    value = data[name]
+    if not isinstance(value, type) or (type is int and isinstance(value, bool)):
+        raise ValueError(f"{name} must be of type {type.__name__}, got {value!r}")
+    return value
+
+def _list_row(list_data):
+    return {
+        'id': _field(list_data, 'id', int),
+        'title': _field(list_data, 'title', str),
+        'description': _field(list_data, 'description', str),
+        'created_date': _parse_date(_field(list_data, 'created_date', str))
+    }
+
+def _task_row(task_data, list_id):
+    return {
+        'id': _field(task_data, 'id', int),
+        'title': _field(task_data, 'title', str),
+        'status': _field(task_data, 'status', bool),
+        'due_date': _parse_date(_field(task_data, 'due_date', str)),
+        'created_date': _parse_date(_field(task_data, 'created_date', str)),
+        'list_id': list_id
+    }
+
+def _import_chunk(chunk, mode, counts):
+    list_rows = [_list_row(list_data) for list_data in chunk]
+    task_rows = [_task_row(task_data, list_data['id']) for list_data in chunk for task_data in list_data.get('tasks', [])]
+
+    existing_lists = _existing_ids(List, [row['id'] for row in list_rows])
+    new_lists, changed_lists = [], []
+    for row in list_rows:
+        (changed_lists if row['id'] in existing_lists else new_lists).append(row)
+        existing_lists.add(row['id'])  # Duplicate ids later in the chunk count as existing
+
+    existing_tasks = _existing_ids(Task, [row['id'] for row in task_rows])
+    new_tasks, changed_tasks = [], []
+    for row in task_rows:
+        (changed_tasks if row['id'] in existing_tasks else new_tasks).append(row)
+        existing_tasks.add(row['id'])
+
+    # Core writes bypass the ORM hook in changes.py, so stamp the revision here.
+    # Insert mode skips existing ids, a chunk of only those writes nothing and
+    # takes no revision.
+    written = new_lists + new_tasks + (changed_lists + changed_tasks if mode == 'upsert' else [])
+    if written:
+        revision = changes.transaction_revision()
+        for row in written:
+            row['revision'] = revision
+
+    # Core executemany inserts, lists first so the tasks' foreign keys resolve
+    if new_lists:
+        db.session.execute(insert(List.__table__), new_lists)
+    if new_tasks:
+        db.session.execute(insert(Task.__table__), new_tasks)
+    counts['lists_inserted'] += len(new_lists)
+    counts['tasks_inserted'] += len(new_tasks)
+
+    if mode == 'upsert':
+        # Bulk UPDATE by primary key
+        if changed_lists:
+            db.session.execute(update(List), changed_lists)
+        if changed_tasks:
+            db.session.execute(update(Task), changed_tasks)
+        counts['lists_updated'] += len(changed_lists)
+        counts['tasks_updated'] += len(changed_tasks)
+
+def import_lists(lists, mode='insert', chunk_size=None, progress=None):
+    # Accepts any iterable of list dicts (including the incremental parsers in
+    # jsonstream), so only one chunk of lists is held in memory at a time
+    if mode not in IMPORT_MODES:
+        abort(400, description=f"Bad request, mode must be one of: {', '.join(IMPORT_MODES)}")
+
+    if chunk_size is not None and chunk_size < 1:
+        abort(400, description="Bad request, chunk_size must be at least 1")
+    chunk_size = chunk_size or app.config['IMPORT_CHUNK_SIZE']
+    counts = {'lists_inserted': 0, 'tasks_inserted': 0, 'lists_updated': 0, 'tasks_updated': 0}
+    started = time.perf_counter()
+
+    # One transaction per chunk of lists
+    try:
+        for chunk in _chunked(lists, chunk_size):
+            _import_chunk(chunk, mode, counts)
+            db.session.commit()
+            cache.invalidate(GLOBAL_TAG)
+            if progress:
+                progress(dict(counts, elapsed_seconds=round(time.perf_counter() - started, 3)))
+    except JSONStreamError as e:
+        db.session.rollback()
+        abort(400, description=f"Bad request, {e}")
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        db.session.rollback()
+        abort(400, description=f"Bad request, invalid list or task data: {e!r}")
+    except (IntegrityError, DataError) as e:
+        db.session.rollback()
+        abort(400, description=f"Bad request, list or task data violates a constraint: {e.orig}")
+    finally:
+        # Also after a failed or cancelled import, since earlier chunks are committed
+        sync_id_sequences(db.session, (List.__table__, Task.__table__))
+
+    counts['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return counts
+
+def import_data_from_json(data, mode='insert', chunk_size=None):
+    if is_columnar(data):
+        try:
+            data = list(iter_columnar(data))
+        except JSONStreamError as e:
+            abort(400, description=f"Bad request, {e}")
     if not data or not isinstance(data, list):
         abort(400, description="Bad request, expected a list of lists with tasks.")
+    return import_lists(data, mode=mode, chunk_size=chunk_size)
 
-    list_insert_count = 0
-    task_insert_count = 0
-
-    for list_data in data:
-        # Check if the list already exists
-        list_obj = List.query.filter_by(id=list_data.get('id')).first()
-        if not list_obj:
-            # Create a new list
-            list_obj = List(
-                id=list_data['id'],
-                title=list_data['title'],
-                description=list_data['description'],
-                created_date=datetime.strptime(list_data['created_date'], '%Y-%m-%d').date()
-            )
-            db.session.add(list_obj)
-            list_insert_count += 1  # Increment list insert counter
+def export_query():
+    # One ordered List LEFT JOIN Task query, one row per task (or per empty list)
+    return (
+        select(List.id, List.title, List.description, List.created_date,
+               Task.id, Task.title, Task.status, Task.due_date, Task.created_date)
+        .outerjoin(Task, Task.list_id == List.id)
+        .order_by(List.id, Task.id)
+        .execution_options(yield_per=app.config['EXPORT_BATCH_SIZE'])
+    )
 
-        db.session.commit()
+_export_list_row = row_serializer(LIST_SCHEMA)
+_export_task_row = row_serializer(EXPORT_TASK_SCHEMA)
 
-        # Process tasks within the list
-        for task_data in list_data['tasks']:
-            task_obj = Task.query.filter_by(id=task_data.get('id')).first()
-            if not task_obj:
-                # Create a new task
-                task_obj = Task(
-                    id=task_data['id'],
-                    title=task_data['title'],
-                    status=task_data['status'],
-                    due_date=datetime.strptime(task_data['due_date'], '%Y-%m-%d').date(),
-                    created_date=datetime.strptime(task_data['created_date'], '%Y-%m-%d').date(),
-                    list_id=list_obj.id
-                )
-                db.session.add(task_obj)
-                task_insert_count += 1  # Increment task insert counter
+def export_list_data(row):
+    list_data = _export_list_row(row[:4])
+    list_data['tasks'] = []
+    return list_data
 
-            db.session.commit()
+def export_task_data(row):
+    return _export_task_row(row[4:])
 
-    return {"lists_inserted": list_insert_count, "tasks_inserted": task_insert_count}
+def iter_export_lists():
+    # Yields each list with its tasks as soon as the next list starts, so memory
+    # stays bounded by one list
+    current = None
+    for row in db.session.execute(export_query()):
+        if current is None or current['id'] != row[0]:
+            if current is not None:
+                yield current
+            current = export_list_data(row)
+        if row[4] is not None:
+            current['tasks'].append(export_task_data(row))
+    if current is not None:
+        yield current
 
-def export_data_as_json():
-    lists = List.query.all()
-    data = []
+def generate_export(format='json', lists=None):
+    lists = iter_export_lists() if lists is None else lists
+    if format == 'ndjson':
+        for list_data in lists:
+            yield app.json.dumps(list_data) + '\n'
+        return
+    if format == 'columnar':
+        yield from generate_columnar_export(lists)
+        return
 
-    for list in lists:
-        tasks = Task.query.filter_by(list_id=list.id).all()
-        task_data = [{'id': task.id, 'title': task.title, 'status': task.status, 'due_date': task.due_date.strftime('%Y-%m-%d'), 'created_date': task.created_date.strftime('%Y-%m-%d')} for task in tasks]
+    # Chunked JSON array, same document /api/import accepts
+    yield '['
+    first = True
+    for list_data in lists:
+        yield ('' if first else ',') + app.json.dumps(list_data)
+        first = False
+    yield ']\n'
 
-        list_data = {
-            'id': list.id,
-            'title': list.title,
-            'description': list.description,
-            'created_date': list.created_date.strftime('%Y-%m-%d'),
-            'tasks': task_data
-        }
-        data.append(list_data)
+def generate_columnar_export(lists):
+    # One array per column instead of one object per row, so field names are not
+    # repeated for every task. Lists are grouped into blocks of about
+    # EXPORT_BATCH_SIZE rows to keep memory bounded while streaming.
+    yield '{"format":"columnar","version":1,"blocks":['
+    first = True
+    for chunk in _columnar_chunks(lists, app.config['EXPORT_BATCH_SIZE']):
+        yield ('' if first else ',') + app.json.dumps(columnar_block(chunk))
+        first = False
+    yield ']}\n'
 
-    return data
+def _columnar_chunks(lists, size):
+    chunk, rows = [], 0
+    for list_data in lists:
+        chunk.append(list_data)
+        rows += 1 + len(list_data['tasks'])
+        if rows >= size:
+            yield chunk
+            chunk, rows = [], 0
+    if chunk:
+        yield chunk
+
+def columnar_block(lists):
+    block = {'lists': {field: [] for field in LIST_SCHEMA}, 'tasks': {field: [] for field in EXPORT_TASK_SCHEMA + ('list_id',)}}
+    list_columns = [block['lists'][field] for field in LIST_SCHEMA]
+    task_columns = [block['tasks'][field] for field in EXPORT_TASK_SCHEMA]
+    for list_data in lists:
+        for column, field in zip(list_columns, LIST_SCHEMA):
+            column.append(list_data[field])
+        for task_data in list_data['tasks']:
+            for column, field in zip(task_columns, EXPORT_TASK_SCHEMA):
+                column.append(task_data[field])
+        block['tasks']['list_id'].extend([list_data['id']] * len(list_data['tasks']))
+    return block
+
+def run_import_job(job, progress):
+    # Background version of /api/import/stream, reading the saved upload. The
+    # completed fraction is the share of the file consumed so far.
+    path = jobs.job_path(job.id, jobs.UPLOAD_SUFFIX)
+    total = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        def report(counts):
+            rows = counts['lists_inserted'] + counts['lists_updated'] + counts['tasks_inserted'] + counts['tasks_updated']
+            progress.update(counts, rows, done=f.tell(), total=total)
+        try:
+            lists = iter_lists(f, job.params.get('format'))
+        except JSONStreamError as e:
+            abort(400, description=f"Bad request, {e}")
+        counts = import_lists(lists, mode=job.params['mode'], chunk_size=job.params.get('chunk_size'), progress=report)
+    rows = counts['lists_inserted'] + counts['lists_updated'] + counts['tasks_inserted'] + counts['tasks_updated']
+    progress.update(counts, rows, done=total, total=total, force=True)
+    return counts
+
+def run_export_job(job, progress):
+    # Writes the export to a gzip file for a later download
+    format = job.params['format']
+    total = db.session.execute(select(func.count(List.id))).scalar()
+    path = jobs.job_path(job.id, f'.{format}.gz')
+    counts = {'lists': 0, 'tasks': 0}
+
+    def counted(lists):
+        for list_data in lists:
+            counts['lists'] += 1
+            counts['tasks'] += len(list_data['tasks'])
+            progress.update(counts, counts['lists'] + counts['tasks'], done=counts['lists'], total=total)
+            yield list_data
+
+    try:
+        with gzip.open(path, 'wt', encoding='utf-8', compresslevel=app.config['JOB_EXPORT_COMPRESSLEVEL']) as f:
+            f.writelines(generate_export(format, counted(iter_export_lists())))
+    except BaseException:
+        os.remove(path)
+        raise
+    progress.update(counts, counts['lists'] + counts['tasks'], done=total, total=total, force=True)
+    return dict(counts, bytes=os.path.getsize(path), file=path)
 
 # Web interface routes for lists
 
 @app.route('/')
+@cache.cached(lambda: ['lists'])
 def index():
-    lists = get_all_lists()
+    lists = get_list_summaries()
     return render_template('index.html', lists=lists)
 
 @app.route('/add', methods=['GET', 'POST'])
@@ -208,6 +685,7 @@ def app_delete_list(list_id):
 # Web interface routes for tasks
 
 @app.route('/lists/<int:list_id>/tasks')
+@cache.cached(lambda list_id: [f'list:{list_id}', f'list:{list_id}:tasks'])
 def tasks_index(list_id):
     list = get_list_by_id(list_id)
     tasks = list.tasks
@@ -258,37 +736,148 @@ def app_delete_task(list_id, task_id):
     delete_task(task)
     return redirect(url_for('tasks_index', list_id=list_id))
 
+# Web interface route for the agenda
+
+@app.route('/agenda')
+@cache.cached(_agenda_tags)
+def app_agenda():
+    # All buckets, or with bucket=<name> one bucket a page at a time
+    bucket = request.args.get('bucket')
+    if bucket is None:
+        return render_template('agenda.html', agenda=get_agenda(date.today(), app.config['AGENDA_BUCKET_SIZE']))
+    if bucket not in AGENDA_BUCKETS:
+        abort(400, description=f"Bad request, bucket must be one of: {', '.join(AGENDA_BUCKETS)}")
+    tasks, next_key = query_agenda_bucket(bucket, date.today(), app.config['AGENDA_PAGE_SIZE'], _arg_cursor(2))
+    count = get_agenda_counts(date.today())[bucket]
+    agenda = {'buckets': {bucket: {'count': count, 'tasks': tasks, 'next_cursor': _encode_cursor(next_key) if next_key else None}}}
+    return render_template('agenda.html', agenda=agenda, bucket_only=True)
+
+# Web interface route for search
+
+@app.route('/search')
+def app_search():
+    query = request.args.get('q', '').strip()
+    results = run_search(query, 'all', app.config['SEARCH_PAGE_SIZE'], 0) if search.match_query(query) else None
+    return render_template('search.html', query=query, results=results)
+
 # Web Interface route for backup
 
 @app.route('/backup', methods=['GET', 'POST'])
 def backup():
     return render_template('backup.html')
 
+# Query parameters shared by the collection endpoints
+
+def _arg_fields(allowed, default):
+    if 'fields' not in request.args:
+        return default
+    fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if not fields or unknown:
+        abort(400, description=f"Bad request, fields must be a comma separated subset of: {', '.join(allowed)}")
+    return fields
+
+def _arg_date(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        abort(400, description=f"Bad request, {name} must be a date in YYYY-MM-DD format")
+
+def _arg_status():
+    value = request.args.get('status')
+    if value is None:
+        return None
+    if value.lower() in ('completed', 'true', '1'):
+        return True
+    if value.lower() in ('open', 'false', '0'):
+        return False
+    abort(400, description="Bad request, status must be 'open' or 'completed'")
+
+def _arg_number(name, default=None, type=int):
+    # request.args.get(name, type=int) would turn a malformed value into the default
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return type(value)
+    except ValueError:
+        abort(400, description=f"Bad request, {name} must be {'an integer' if type is int else 'a number'}")
+
+def _arg_limit(maximum=None):
+    maximum = maximum or app.config['API_MAX_PAGE_SIZE']
+    limit = _arg_number('limit')
+    if limit is not None and limit < 1:
+        abort(400, description="Bad request, limit must be at least 1")
+    if limit is None and 'cursor' not in request.args:
+        return None
+    return min(limit or maximum, maximum)
+
+def _arg_chunk_size():
+    # Checked here too so an import job fails when it's submitted, not when it runs
+    chunk_size = _arg_number('chunk_size')
+    if chunk_size is not None and chunk_size < 1:
+        abort(400, description="Bad request, chunk_size must be at least 1")
+    return chunk_size
+
+def _arg_cursor(size=1, dated=True):
+    # Cursors are opaque to clients: the url-safe base64 JSON key of the last row,
+    # either [id] or [due_date, id], or a list of ints when not dated
+    value = request.args.get('cursor')
+    if not value:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(value.encode()))
+        if not isinstance(key, list) or len(key) != size or not isinstance(key[-1], int):
+            raise ValueError(key)
+        if size == 2 and dated:
+            date.fromisoformat(key[0])
+        elif not all(isinstance(part, int) for part in key):
+            raise ValueError(key)
+        return key
+    except (ValueError, TypeError):
+        abort(400, description="Bad request, invalid cursor")
+
+def _encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def _page_response(items, next_key):
+    response = jsonify(items)
+    if next_key is not None:
+        next_cursor = _encode_cursor(next_key)
+        next_url = request.base_url + '?' + urlencode({**request.args.to_dict(), 'cursor': next_cursor})
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response, 200
+
 # REST API Endpoints for lists
 @app.route('/api/lists', methods=['GET'])
+@cache.cached(lambda: ['lists'])
 def api_get_lists():
-    lists = get_all_lists()
-    lists_list = [{'id': list.id, 'title': list.title, 'description': list.description, 'created_date': list.created_date} for list in lists]
-    return jsonify(lists_list), 200
+    fields = _arg_fields(LIST_FIELDS, LIST_FIELDS)
+    lists, next_key = query_lists(fields, limit=_arg_limit(), cursor=_arg_cursor())
+    return _page_response(serialize_rows(lists, fields), next_key)
 
 @app.route('/api/lists/<int:list_id>', methods=['GET'])
+@cache.cached(lambda list_id: [f'list:{list_id}'])
 def api_get_list(list_id):
     list = get_list_by_id(list_id)
-    list_data = {'id': list.id, 'title': list.title, 'description': list.description, 'created_date': list.created_date.strftime('%Y-%m-%d')}
-    return jsonify(list_data), 200
+    return jsonify(serialize_list(list)), 200
 
 @app.route('/api/lists', methods=['POST'])
 def api_post_list():
     data = request.get_json()
     new_list = create_list(data)
-    return jsonify({'id': new_list.id, 'title': new_list.title, 'description': new_list.description, 'created_date': new_list.created_date.strftime('%Y-%m-%d')}), 201
+    return jsonify(serialize_list(new_list)), 201
 
 @app.route('/api/lists/<int:list_id>', methods=['PUT'])
 def api_put_list(list_id):
     list = get_list_by_id(list_id)
     data = request.get_json()
     updated_list = update_list(list, data)
-    return jsonify({'id': updated_list.id, 'title': updated_list.title, 'description': updated_list.description, 'created_date': updated_list.created_date.strftime('%Y-%m-%d')}), 200
+    return jsonify(serialize_list(updated_list)), 200
 
 @app.route('/api/lists/<int:list_id>', methods=['DELETE'])
 def api_delete_list(list_id):
@@ -301,30 +890,59 @@ def api_delete_list(list_id):
 # REST API Endpoints for tasks
 @app.route('/api/tasks', methods=['GET'])
 def api_get_tasks():
-    tasks = get_all_tasks()
-    tasks_list = [{'id': task.id, 'title': task.title, 'due_date': task.due_date.strftime('%Y-%m-%d'), 'status': task.status} for task in tasks]
-    return jsonify(tasks_list)
+    return _api_task_page(_arg_number('list_id'))
+
+@app.route('/api/agenda', methods=['GET'])
+@cache.cached(_agenda_tags)
+def api_get_agenda():
+    # Open tasks across all lists in overdue/today/this_week/later buckets with
+    # their counts. With bucket=<name> one bucket is paged through with limit and
+    # cursor like /api/tasks.
+    bucket = request.args.get('bucket')
+    if bucket is None:
+        limit = _arg_limit() or app.config['AGENDA_BUCKET_SIZE']
+        return jsonify(get_agenda(date.today(), limit)), 200
+    if bucket not in AGENDA_BUCKETS:
+        abort(400, description=f"Bad request, bucket must be one of: {', '.join(AGENDA_BUCKETS)}")
+    tasks, next_key = query_agenda_bucket(bucket, date.today(), _arg_limit() or app.config['API_MAX_PAGE_SIZE'], _arg_cursor(2))
+    return _page_response(tasks, next_key)
 
 @app.route('/api/tasks/<int:task_id>', methods=['GET'])
 def api_get_task(task_id):
     task = get_task_by_id(task_id)
-    task_data = {'id': task.id, 'title': task.title, 'status': task.status, 'due_date': task.due_date.strftime('%Y-%m-%d'), 'created_date': task.created_date.strftime('%Y-%m-%d')}
+    task_data = serialize_task(task)
     if(task_data):
         return jsonify(task_data), 200
     else:
         return abort(204)
     
 @app.route('/api/tasks_by_list_id/<int:list_id>', methods=['GET'])
+@cache.cached(lambda list_id: [f'list:{list_id}:tasks'])
 def api_get_tasks_by_list_id(list_id):
-    tasks = get_tasks_by_list_id(list_id)
-    tasks_list = [{'id': task.id, 'title': task.title, 'due_date': task.due_date.strftime('%Y-%m-%d'), 'status': task.status} for task in tasks]
-    return jsonify(tasks_list)
+    return _api_task_page(list_id)
+
+def _api_task_page(list_id):
+    fields = _arg_fields(TASK_FIELDS, DEFAULT_TASK_FIELDS)
+    order = request.args.get('order', 'id')
+    if order not in TASK_ORDERS:
+        abort(400, description=f"Bad request, order must be one of: {', '.join(TASK_ORDERS)}")
+    tasks, next_key = query_tasks(
+        fields,
+        status=_arg_status(),
+        due_before=_arg_date('due_before'),
+        due_after=_arg_date('due_after'),
+        list_id=list_id,
+        order=order,
+        limit=_arg_limit(),
+        cursor=_arg_cursor(2 if order == 'due_date' else 1)
+    )
+    return _page_response(serialize_rows(tasks, fields), next_key)
 
 @app.route('/api/tasks', methods=['POST'])
 def api_post_task():
     data = request.get_json()
     new_task = create_task(data)
-    return jsonify({'id': new_task.id, 'title': new_task.title, 'status': new_task.status, 'due_date': new_task.due_date.strftime('%Y-%m-%d'), 'created_date': new_task.created_date.strftime('%Y-%m-%d')}), 201
+    return jsonify(serialize_task(new_task)), 201
 
 @app.route('/api/tasks/<int:task_id>', methods=['PUT'])
 def api_put_task(task_id):
@@ -332,30 +950,192 @@ def api_put_task(task_id):
     data = request.get_json()
     updated_task = update_task(task, data)
     if updated_task != None:
-        return jsonify({'id': updated_task.id, 'title': updated_task.title, 'due_date': updated_task.due_date.strftime('%Y-%m-%d'), 'created_date': updated_task.created_date.strftime('%Y-%m-%d')}), 200
+        return jsonify(serialize_task(updated_task)), 200
     else: 
         return abort(400)
 
+@app.route('/api/tasks/batch', methods=['POST'])
+def api_task_batch():
+    data = request.get_json()
+    if not isinstance(data, dict):
+        abort(400, description="Bad request, expected an object with an operations list")
+    atomic = data.get('atomic', True)
+    if not isinstance(atomic, bool):
+        abort(400, description="Bad request, atomic must be true or false")
+    result = apply_task_batch(data.get('operations'), atomic=atomic)
+    return jsonify(result), 200 if result['committed'] else 400
+
 @app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 def api_delete_task(task_id):
     task = get_task_by_id(task_id)
     delete_task(task)
     return jsonify(""), 204
 
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    query = request.args.get('q', '')
+    if not search.match_query(query):
+        abort(400, description="Bad request, q must contain at least one word")
+    type = request.args.get('type', 'all')
+    if type not in search.SEARCH_TYPES:
+        abort(400, description=f"Bad request, type must be one of: {', '.join(search.SEARCH_TYPES)}")
+    limit = _arg_limit() or app.config['SEARCH_PAGE_SIZE']
+    offset = max(0, _arg_number('offset', 0))
+    return jsonify({'query': query, **run_search(query, type, limit, offset)}), 200
+
 @app.route('/api/import', methods=['POST'])
 def api_import_data():
     data = request.get_json()
-    result = import_data_from_json(data)
-    return jsonify({
-        "message": "Data imported successfully!",
-        "lists_inserted": result["lists_inserted"],
-        "tasks_inserted": result["tasks_inserted"]
-    }), 201
+    result = import_data_from_json(data, mode=request.args.get('mode', 'insert'), chunk_size=_arg_chunk_size())
+    return jsonify({"message": "Data imported successfully!", **result}), 201
+
+@app.route('/api/import/stream', methods=['POST'])
+def api_import_stream():
+    # Reads the request body incrementally instead of request.get_json(), so
+    # large backups are never fully parsed into memory
+    format = request.args.get('format')
+    if format is None and request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        format = 'ndjson'
+    def log_progress(counts):
+        app.logger.info("Import progress: %(lists_inserted)d lists and %(tasks_inserted)d tasks inserted, %(lists_updated)d lists and %(tasks_updated)d tasks updated (%(elapsed_seconds).1fs)", counts)
+    try:
+        lists = iter_lists(request.stream, format)
+    except JSONStreamError as e:
+        abort(400, description=f"Bad request, {e}")
+    result = import_lists(lists, mode=request.args.get('mode', 'insert'), chunk_size=_arg_chunk_size(), progress=log_progress)
+    return jsonify({"message": "Data imported successfully!", **result}), 201
 
 @app.route('/api/export', methods=['GET'])
 def api_export_data():
-    data = export_data_as_json()
-    return jsonify(data), 200
+    format = request.args.get('format', 'json')
+    if format not in EXPORT_FORMATS:
+        abort(400, description=f"Bad request, format must be one of: {', '.join(EXPORT_FORMATS)}")
+    return Response(stream_with_context(generate_export(format)), mimetype=EXPORT_MIMETYPES[format]), 200
+
+@app.route('/api/snapshot', methods=['GET'])
+def api_get_snapshot():
+    # Compressed copy of the SQLite database file, the fastest full backup
+    if not snapshot.is_supported():
+        abort(400, description="Bad request, snapshots are only available for SQLite databases, use /api/export")
+    codec = request.args.get('codec', snapshot.default_codec())
+    filename = f"tasks-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db{snapshot.EXTENSIONS.get(codec, '')}"
+    response = Response(stream_with_context(snapshot.generate_snapshot(codec)), mimetype=snapshot.MIMETYPES[codec])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response, 200
+
+@app.route('/api/snapshot/restore', methods=['POST'])
+def api_restore_snapshot():
+    # Replaces all lists and tasks with the snapshot in the request body
+    if not snapshot.is_supported():
+        abort(400, description="Bad request, snapshots are only available for SQLite databases, use /api/import")
+    result = snapshot.restore_snapshot(request.stream)
+    return jsonify({"message": "Snapshot restored successfully!", **result}), 200
+
+# Change feed
+
+@app.route('/api/changes', methods=['GET'])
+def api_get_changes():
+    # Tasks and lists changed after revision `since`, plus the ids deleted since.
+    # With wait=<seconds> the request is held until something changes (long-poll).
+    # Pages with has_more carry a next_cursor, follow it instead of since so a full
+    # resync isn't sent back to since=0 by a prune that happened before it started.
+    cursor = _arg_cursor(2, dated=False)
+    since, pruned_seen = cursor if cursor else (_arg_number('since', 0), None)
+    if since < 0:
+        abort(400, description="Bad request, since must be a revision number")
+    limit = _arg_limit(app.config['CHANGES_MAX_ROWS']) or app.config['CHANGES_MAX_ROWS']
+    wait = max(0, min(_arg_number('wait', 0, float), app.config['CHANGES_MAX_WAIT']))
+    if wait:
+        changes.wait_for_changes(since, wait)
+    page = changes.get_changes(since, limit, pruned_seen)
+    next_key = page.pop('next_key')
+    page['next_cursor'] = _encode_cursor(next_key) if next_key else None
+    return jsonify(page), 200
+
+# Background jobs
+
+@app.route('/api/jobs/import', methods=['POST'])
+def api_import_job():
+    # Same body and parameters as /api/import/stream, answered with 202 and the job
+    mode = request.args.get('mode', 'insert')
+    if mode not in IMPORT_MODES:
+        abort(400, description=f"Bad request, mode must be one of: {', '.join(IMPORT_MODES)}")
+    format = request.args.get('format')
+    if format is None and request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        format = 'ndjson'
+    if format is not None and format not in IMPORT_FORMATS:
+        abort(400, description=f"Bad request, format must be one of: {', '.join(IMPORT_FORMATS)}")
+    params = {'mode': mode, 'format': format, 'chunk_size': _arg_chunk_size()}
+    job = jobs.submit('import', run_import_job, params, upload=request.stream)
+    return _job_response(job)
+
+@app.route('/api/jobs/export', methods=['POST'])
+def api_export_job():
+    format = request.args.get('format', 'json')
+    if format not in EXPORT_FORMATS:
+        abort(400, description=f"Bad request, format must be one of: {', '.join(EXPORT_FORMATS)}")
+    job = jobs.submit('export', run_export_job, {'format': format})
+    return _job_response(job)
+
+@app.route('/api/jobs', methods=['GET'])
+def api_get_jobs():
+    recent = db.session.execute(select(Job).order_by(Job.created_at.desc()).limit(50)).scalars().all()
+    jobs.fail_stale_jobs(recent)
+    return jsonify([_job_data(job) for job in recent]), 200
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_get_job(job_id):
+    return jsonify(_job_data(jobs.get_job(job_id))), 200
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    job = jobs.get_job(job_id)
+    if not jobs.cancel_job(job):
+        abort(409, description=f"Job already {job.status}")
+    return jsonify(_job_data(job)), 202
+
+@app.route('/api/jobs/<job_id>/download', methods=['GET'])
+def api_download_job(job_id):
+    job = jobs.get_job(job_id)
+    if job.status != 'succeeded' or not job.result_path or not os.path.exists(job.result_path):
+        abort(404, description="No export file for this job")
+    download_name = f"backup-{job.created_at:%Y%m%d-%H%M%S}.{job.params['format']}.gz"
+    return send_file(job.result_path, mimetype='application/gzip', as_attachment=True, download_name=download_name)
+
+def _job_data(job):
+    data = jobs.job_data(job)
+    if job.result_path:
+        data['download_url'] = url_for('api_download_job', job_id=job.id)
+    return data
+
+def _job_response(job):
+    response = jsonify(_job_data(job))
+    response.headers['Location'] = url_for('api_get_job', job_id=job.id)
+    return response, 202
+
+# CLI commands
+
+@app.cli.command('import-data')
+@click.argument('file', type=click.File('rb'))
+@click.option('--format', type=click.Choice(IMPORT_FORMATS), help='Input format, detected from the file when omitted.')
+@click.option('--mode', type=click.Choice(IMPORT_MODES), default='insert', show_default=True)
+@click.option('--chunk-size', type=click.IntRange(min=1), help='Lists per transaction.')
+def import_data_command(file, format, mode, chunk_size):
+    """Import a backup file (JSON array or NDJSON) in bounded batches."""
+    def echo_progress(counts):
+        click.echo(f"{counts['lists_inserted'] + counts['lists_updated']} lists, {counts['tasks_inserted'] + counts['tasks_updated']} tasks written ({counts['elapsed_seconds']:.1f}s)")
+    try:
+        result = import_lists(iter_lists(file, format), mode=mode, chunk_size=chunk_size, progress=echo_progress)
+    except (JSONStreamError, HTTPException) as e:
+        raise click.ClickException(getattr(e, 'description', None) or str(e))
+    click.echo(f"Done: {result['lists_inserted']} lists and {result['tasks_inserted']} tasks inserted, {result['lists_updated']} lists and {result['tasks_updated']} tasks updated in {result['elapsed_seconds']}s")
+
+@app.cli.command('assets-build')
+@click.option('--output', default='dist', show_default=True, help='Directory for the built files.')
+def assets_build_command(output):
+    """Write the fingerprinted assets with their gzip/brotli variants for a front proxy."""
+    for filename in assets.write(output):
+        click.echo(f"{output}/{filename}")
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
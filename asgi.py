@@ -0,0 +1,123 @@
+# asgi.py
+#
+# Optional async variant of the read-only API, for slow clients and large exports
+# that would otherwise hold a sync worker for the whole response:
+#
+#   gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+#
+# GET /api/lists, /api/tasks and the json and ndjson /api/export are served here
+# with an async database driver (aiosqlite for SQLite, asyncpg for PostgreSQL).
+# They reuse the queries and serialization from app.py, so the output is
+# identical. Requests with other query parameters (pagination, filters, fields,
+# other export formats) and every other route are handed to the Flask app, which
+# runs in a thread pool.
+#
+# Needs: pip install uvicorn asgiref aiosqlite (or asyncpg for PostgreSQL)
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import app, db, lists_query, tasks_query, export_query, export_list_data, export_task_data, LIST_FIELDS, DEFAULT_TASK_FIELDS, EXPORT_MIMETYPES
+from database import apply_sqlite_pragmas
+from serializers import serialize_rows
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+SEND_BUFFER_SIZE = 64 * 1024
+ASYNC_EXPORT_FORMATS = ('json', 'ndjson')  # Other export formats go to the Flask app
+
+def create_engine_for_app():
+    with app.app_context():
+        url = db.engine.url  # Resolved by Flask-SQLAlchemy, e.g. the instance folder for SQLite
+    engine = create_async_engine(url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]), **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+    if url.get_backend_name() == 'sqlite':
+        event.listen(engine.sync_engine, 'connect', lambda dbapi_connection, connection_record: apply_sqlite_pragmas(dbapi_connection))
+    return engine
+
+engine = create_engine_for_app()
+
+class FlaskInstance(WsgiToAsgiInstance):
+    # asgiref runs WSGI apps on one shared "thread sensitive" thread by default,
+    # which serializes every Flask request and breaks across keep-alive requests
+    # under uvicorn. The Flask app is thread safe, so use the thread pool instead.
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False)
+
+class FlaskApplication(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await FlaskInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+flask_application = FlaskApplication(app)
+
+async def send_json(send, data, status=200):
+    # Same bytes as jsonify outside debug mode: compact separators and a trailing newline
+    body = (app.json.dumps(data, separators=(',', ':')) + '\n').encode()
+    await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def get_lists(scope, receive, send):
+    async with engine.connect() as connection:
+        rows = (await connection.execute(lists_query(LIST_FIELDS))).all()
+    await send_json(send, serialize_rows(rows, LIST_FIELDS))
+
+async def get_tasks(scope, receive, send):
+    async with engine.connect() as connection:
+        rows = (await connection.execute(tasks_query(DEFAULT_TASK_FIELDS))).all()
+    await send_json(send, serialize_rows(rows, DEFAULT_TASK_FIELDS))
+
+async def iter_export_lists(connection):
+    # Same grouping as app.iter_export_lists, over a streaming async result
+    current = None
+    result = await connection.stream(export_query())
+    async for row in result:
+        if current is None or current['id'] != row[0]:
+            if current is not None:
+                yield current
+            current = export_list_data(row)
+        if row[4] is not None:
+            current['tasks'].append(export_task_data(row))
+    if current is not None:
+        yield current
+
+async def get_export(scope, receive, send, format):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', EXPORT_MIMETYPES[format].encode())]})
+    buffer = [] if format == 'ndjson' else ['[']
+    size = 0
+    first = True
+    async with engine.connect() as connection:
+        async for list_data in iter_export_lists(connection):
+            chunk = app.json.dumps(list_data) + '\n' if format == 'ndjson' else ('' if first else ',') + app.json.dumps(list_data)
+            first = False
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= SEND_BUFFER_SIZE:
+                await send({'type': 'http.response.body', 'body': ''.join(buffer).encode(), 'more_body': True})
+                buffer, size = [], 0
+    if format == 'json':
+        buffer.append(']\n')
+    await send({'type': 'http.response.body', 'body': ''.join(buffer).encode()})
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        path, query = scope['path'], scope['query_string'].decode()
+        if path == '/api/lists' and not query:
+            return await get_lists(scope, receive, send)
+        if path == '/api/tasks' and not query:
+            return await get_tasks(scope, receive, send)
+        if path == '/api/export' and query in ('', *(f'format={format}' for format in ASYNC_EXPORT_FORMATS)):
+            return await get_export(scope, receive, send, query.partition('=')[2] or 'json')
+
+    return await flask_application(scope, receive, send)
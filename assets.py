@@ -0,0 +1,119 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+from flask import request, Response, abort
+from markupsafe import Markup, escape
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Built static assets. Instead of the full Bootstrap Icons font (a ~100 KB
+# stylesheet plus a ~130 KB font) or one request per SVG, pages reference one SVG
+# sprite holding only the icons the templates use, via {{ icon('name') }}.
+#
+# The bundle is built in memory when the app starts: the templates are scanned
+# for icon('...') calls (plus ASSETS_EXTRA_ICONS for names only known at runtime),
+# file names carry a content hash so responses can be cached as immutable, and
+# gzip and brotli (when the brotli package is installed) variants are compressed
+# once up front. `flask assets-build` writes the same files to a directory for a
+# front proxy or CDN to serve.
+
+ICON_CALL = re.compile(r"""icon\(\s*['"]([\w-]+)['"]""")
+SVG_BODY = re.compile(r'<svg[^>]*\sviewBox="([^"]+)"[^>]*>(.*)</svg>', re.S)
+MIMETYPES = {'.svg': 'image/svg+xml', '.css': 'text/css', '.js': 'application/javascript'}
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # In order of preference
+
+class Assets:
+    def __init__(self, app=None):
+        self.files = {}
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_ICON_DIR', os.path.join(app.static_folder, 'icons'))
+        app.config.setdefault('ASSETS_URL_PATH', '/assets/dist')
+        app.config.setdefault('ASSETS_EXTRA_ICONS', '')
+        app.config.setdefault('ASSETS_MAX_AGE', 31536000)
+        app.config.setdefault('ASSETS_ICON_SIZE', 28)
+        self.app = app
+        self.build()
+        app.add_url_rule(app.config['ASSETS_URL_PATH'] + '/<filename>', 'built_asset', self.serve)
+        app.jinja_env.globals.update(icon=self.icon, asset_url=self.url)
+
+    def used_icons(self):
+        names = {name for name in self.app.config['ASSETS_EXTRA_ICONS'].split(',') if name}
+        for root, _, files in os.walk(os.path.join(self.app.root_path, self.app.template_folder)):
+            for filename in files:
+                if filename.endswith('.html'):
+                    with open(os.path.join(root, filename), encoding='utf-8') as f:
+                        names.update(ICON_CALL.findall(f.read()))
+        return sorted(names)
+
+    def build_sprite(self, names):
+        symbols = []
+        for name in names:
+            path = os.path.join(self.app.config['ASSETS_ICON_DIR'], name + '.svg')
+            if not os.path.exists(path):
+                raise ValueError(f"Unknown icon {name!r}, no {path}")
+            with open(path, encoding='utf-8') as f:
+                view_box, body = SVG_BODY.search(f.read()).groups()
+            body = re.sub(r'>\s+<', '><', body.strip())
+            symbols.append(f'<symbol id="bi-{name}" viewBox="{view_box}">{body}</symbol>')
+        return ('<svg xmlns="http://www.w3.org/2000/svg">' + ''.join(symbols) + '</svg>').encode()
+
+    def build(self):
+        self.files, self.manifest = {}, {}
+        self.icons = set(self.used_icons())
+        self.add('icons.svg', self.build_sprite(sorted(self.icons)))
+
+    def add(self, name, data):
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, extension = os.path.splitext(name)
+        filename = f'{stem}.{digest}{extension}'
+        variants = {'identity': data, 'gzip': gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        self.files[filename] = {'variants': variants, 'etag': digest, 'mimetype': MIMETYPES.get(extension, 'application/octet-stream')}
+        self.manifest[name] = filename
+
+    def url(self, name):
+        return f"{self.app.config['ASSETS_URL_PATH']}/{self.manifest[name]}"
+
+    def icon(self, name, size=None, label=None):
+        if name not in self.icons:
+            raise ValueError(f"Icon {name!r} is not in the sprite, add it to ASSETS_EXTRA_ICONS")
+        size = size or self.app.config['ASSETS_ICON_SIZE']
+        accessibility = f'role="img" aria-label="{escape(label)}"' if label else 'aria-hidden="true"'
+        return Markup(f'<svg class="bi" width="{size}" height="{size}" {accessibility}><use href="{self.url("icons.svg")}#bi-{name}"></use></svg>')
+
+    def serve(self, filename):
+        asset = self.files.get(filename)
+        if asset is None:
+            abort(404)
+        # The smallest variant the client accepts, falling back to the uncompressed file
+        encoding = next((encoding for encoding, _ in ENCODINGS if encoding in asset['variants'] and request.accept_encodings[encoding]), 'identity')
+        response = Response(asset['variants'][encoding], mimetype=asset['mimetype'])
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = f"public, max-age={self.app.config['ASSETS_MAX_AGE']}, immutable"
+        response.set_etag(f"{asset['etag']}-{encoding}")
+        return response.make_conditional(request)
+
+    def write(self, directory):
+        # Every file with its .gz/.br siblings, plus manifest.json mapping the
+        # logical names to the fingerprinted ones
+        os.makedirs(directory, exist_ok=True)
+        for filename, asset in self.files.items():
+            for encoding, data in asset['variants'].items():
+                suffix = dict(ENCODINGS).get(encoding, '')
+                with open(os.path.join(directory, filename + suffix), 'wb') as f:
+                    f.write(data)
+        with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        return sorted(self.files)
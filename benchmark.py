@@ -0,0 +1,280 @@
+# benchmark.py
+#
+# Repeatable benchmarks for the main read paths, export and import at several
+# data sizes. Every size runs in its own subprocess against a fresh SQLite file
+# filled by datagen.generate_data, so runs don't share caches or memory peaks.
+#
+#   python benchmark.py --sizes 100x10,1000x100 --output results.json
+#   python benchmark.py --sizes 1000x100 --baseline results.json   # exit 1 on regressions
+#   python benchmark.py --sizes '' --serialization 100000           # serializer micro-benchmark
+#
+# Every size also compares the backup formats: size and time of the JSON and
+# columnar exports (plain and gzipped) against database snapshots, and how long
+# a snapshot takes to restore.
+#
+# Requests go through Flask's test client in-process, so the numbers measure the
+# application and database work without any HTTP server in front.
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ENDPOINTS = [
+    ('/', lambda list_ids: '/'),
+    ('/lists/<id>/tasks', lambda list_ids: f'/lists/{random.choice(list_ids)}/tasks'),
+    ('/api/tasks', lambda list_ids: '/api/tasks'),
+    ('/api/tasks_by_list_id/<id>', lambda list_ids: f'/api/tasks_by_list_id/{random.choice(list_ids)}'),
+    ('/api/agenda', lambda list_ids: '/api/agenda'),
+]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarize(durations):
+    total = sum(durations)
+    return {
+        'requests': len(durations),
+        'mean_ms': round(total / len(durations) * 1000, 3),
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(durations, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(durations, 0.99) * 1000, 3),
+        'throughput_rps': round(len(durations) / total, 1) if total else None,
+    }
+
+def reset_peak_rss():
+    # Linux resets VmHWM when "5" is written to clear_refs; elsewhere the peak
+    # stays the process-wide maximum
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def timed(client, method, url, **kwargs):
+    started = time.perf_counter()
+    response = getattr(client, method)(url, **kwargs)
+    body = response.get_data()  # Drains streamed responses
+    elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method.upper()} {url} returned {response.status_code}: {body[:200]!r}")
+    return elapsed, body
+
+def reset_database(app, db, upgrade):
+    # Starts from an empty file, the search tables and migration versions included
+    with app.app_context():
+        db.engine.dispose()
+        path = db.engine.url.database
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        upgrade()
+
+def run_size(num_lists, tasks_per_list, requests, export_runs, workdir):
+    # Runs inside the subprocess: configure the app for a fresh database first
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('CACHE_BACKEND', 'none')
+    os.environ.setdefault('PERF_SLOW_REQUEST_MS', '1e9')
+    os.environ.setdefault('PERF_N_PLUS_ONE_THRESHOLD', '1000000000')
+    from app import app, db
+    from models import List
+    from migrations import upgrade
+    from datagen import generate_data
+
+    random.seed(0)
+    result = {'lists': num_lists, 'tasks_per_list': tasks_per_list, 'endpoints': {}}
+    with app.app_context():
+        upgrade()
+        started = time.perf_counter()
+        generate_data(num_lists, tasks_per_list)
+        result['generate_seconds'] = round(time.perf_counter() - started, 3)
+        list_ids = [row[0] for row in db.session.query(List.id)]
+
+    client = app.test_client()
+    for name, url_for_run in ENDPOINTS:
+        timed(client, 'get', url_for_run(list_ids))  # Warm-up
+        result['endpoints'][name] = summarize([timed(client, 'get', url_for_run(list_ids))[0] for _ in range(requests)])
+
+    backup_path = os.path.join(workdir, 'backup.json')
+    durations = []
+    for _ in range(export_runs):
+        reset_peak_rss()
+        elapsed, body = timed(client, 'get', '/api/export')
+        durations.append(elapsed)
+    with open(backup_path, 'wb') as f:
+        f.write(body)
+    result['export'] = dict(summarize(durations), bytes=len(body), peak_rss_kb=peak_rss_kb())
+    del body
+    result['backups'] = run_backups(client)
+
+    for name, url in (('/api/import', '/api/import'), ('/api/import/stream', '/api/import/stream')):
+        reset_database(app, db, upgrade)
+        reset_peak_rss()
+        with open(backup_path, 'rb') as f:
+            elapsed, _ = timed(client, 'post', url, data=f.read() if url == '/api/import' else f, content_type='application/json')
+        result['endpoints'][name] = dict(summarize([elapsed]), peak_rss_kb=peak_rss_kb())
+    return result
+
+def run_backups(client):
+    from snapshot import zstandard
+    backups = {}
+    for format in ('json', 'columnar'):
+        elapsed, body = timed(client, 'get', f'/api/export?format={format}')
+        started = time.perf_counter()
+        compressed = gzip.compress(body, 6)
+        backups[format] = {'bytes': len(body), 'ms': round(elapsed * 1000, 1)}
+        backups[format + '.gz'] = {'bytes': len(compressed), 'ms': round((elapsed + time.perf_counter() - started) * 1000, 1)}
+    for codec in ('zstd', 'gzip') if zstandard is not None else ('gzip',):
+        elapsed, body = timed(client, 'get', f'/api/snapshot?codec={codec}')
+        restore_elapsed, _ = timed(client, 'post', '/api/snapshot/restore', data=body)
+        backups['snapshot.' + codec] = {'bytes': len(body), 'ms': round(elapsed * 1000, 1), 'restore_ms': round(restore_elapsed * 1000, 1)}
+    return backups
+
+def best_of(runs, function):
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - started)
+    return min(durations), result
+
+def run_serialization(num_rows, runs, workdir):
+    # Task list response bodies built the old way (ORM objects, strftime per date,
+    # json module) against row tuples + serializers.serialize_rows + orjson
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('PERF_N_PLUS_ONE_THRESHOLD', '1000000000')
+    from flask.json.provider import DefaultJSONProvider
+    from app import app, db, tasks_query, TASK_FIELDS
+    from models import Task
+    from migrations import upgrade
+    from datagen import generate_data
+    from serializers import serialize_rows, OrjsonProvider, orjson
+
+    def orm_objects():
+        db.session.expire_all()
+        return [{'id': task.id, 'title': task.title, 'status': task.status, 'due_date': task.due_date.strftime('%Y-%m-%d'), 'created_date': task.created_date.strftime('%Y-%m-%d'), 'list_id': task.list_id} for task in Task.query.all()]
+
+    def row_tuples():
+        return serialize_rows(db.session.execute(tasks_query(TASK_FIELDS)).all(), TASK_FIELDS)
+
+    encoders = {'json': DefaultJSONProvider(app).dumps}
+    if orjson is not None:
+        encoders['orjson'] = OrjsonProvider(app).dumps
+    result = {'rows': num_rows, 'build_ms': {}, 'encode_ms': {}}
+    with app.app_context():
+        upgrade()
+        generate_data(max(1, num_rows // 100), min(num_rows, 100))
+        items = None
+        for name, build in (('orm_objects', orm_objects), ('row_tuples', row_tuples)):
+            elapsed, items = best_of(runs, build)
+            result['build_ms'][name] = round(elapsed * 1000, 1)
+        for name, encode in encoders.items():
+            result['encode_ms'][name] = round(best_of(runs, lambda: encode(items))[0] * 1000, 1)
+
+    before = result['build_ms']['orm_objects'] + result['encode_ms']['json']
+    after = result['build_ms']['row_tuples'] + min(result['encode_ms'].values())
+    result['total_ms'] = {'before': round(before, 1), 'after': round(after, 1)}
+    result['speedup'] = round(before / after, 2)
+    return result
+
+def compare(results, baseline, threshold):
+    # A metric regresses when it is more than threshold times its baseline value
+    regressions = []
+    for size, current in results['sizes'].items():
+        previous = baseline.get('sizes', {}).get(size)
+        if not previous:
+            continue
+        for name, stats in list(current['endpoints'].items()) + [('/api/export', current['export'])]:
+            before = previous['endpoints'].get(name) if name != '/api/export' else previous.get('export')
+            if not before:
+                continue
+            for metric in ('p50_ms', 'p90_ms', 'peak_rss_kb'):
+                if metric in stats and before.get(metric) and stats[metric] > before[metric] * threshold:
+                    regressions.append(f"{size} {name} {metric}: {before[metric]} -> {stats[metric]}")
+    return regressions
+
+def run_subprocess(*args):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *args],
+        check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the task list app at several data sizes.")
+    parser.add_argument('--sizes', default='100x10,1000x100', help="Comma separated LISTSxTASKS_PER_LIST sizes (default: 100x10,1000x100).")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per read endpoint and size (default: 50).")
+    parser.add_argument('--export-runs', type=int, default=3, help="Export requests per size (default: 3).")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON results.")
+    parser.add_argument('--baseline', help="Earlier results file to compare against.")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Ratio over the baseline that counts as a regression (default: 1.25).")
+    parser.add_argument('--serialization', type=int, metavar='ROWS', help="Also run the serializer micro-benchmark on ROWS tasks, e.g. 100000.")
+    parser.add_argument('--run-size', help=argparse.SUPPRESS)
+    parser.add_argument('--run-serialization', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        num_lists, tasks_per_list = (int(part) for part in args.run_size.split('x'))
+        with tempfile.TemporaryDirectory() as workdir:
+            print(json.dumps(run_size(num_lists, tasks_per_list, args.requests, args.export_runs, workdir)))
+        return
+    if args.run_serialization:
+        with tempfile.TemporaryDirectory() as workdir:
+            print(json.dumps(run_serialization(args.run_serialization, 3, workdir)))
+        return
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': {}
+    }
+    for size in filter(None, args.sizes.split(',')):
+        print(f"Running {size}...", file=sys.stderr)
+        results['sizes'][size] = run_subprocess('--run-size', size, '--requests', str(args.requests), '--export-runs', str(args.export_runs))
+        for name, stats in list(results['sizes'][size]['endpoints'].items()) + [('/api/export', results['sizes'][size]['export'])]:
+            print(f"  {name:30} p50 {stats['p50_ms']:>10} ms  p99 {stats['p99_ms']:>10} ms  {stats.get('peak_rss_kb', '')}", file=sys.stderr)
+        for name, stats in results['sizes'][size]['backups'].items():
+            restore = f"  restore {stats['restore_ms']} ms" if 'restore_ms' in stats else ''
+            print(f"  backup {name:23} {stats['bytes']:>12} bytes  {stats['ms']:>10} ms{restore}", file=sys.stderr)
+
+    if args.serialization:
+        print(f"Running serialization of {args.serialization} tasks...", file=sys.stderr)
+        stats = results['serialization'] = run_subprocess('--run-serialization', str(args.serialization))
+        print(f"  build   {stats['build_ms']} ms", file=sys.stderr)
+        print(f"  encode  {stats['encode_ms']} ms", file=sys.stderr)
+        print(f"  total   {stats['total_ms']['before']} ms -> {stats['total_ms']['after']} ms ({stats['speedup']}x)", file=sys.stderr)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+import hashlib
+import importlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, make_response
+
+# Read-through response cache for GET views.
+#
+# Every cached view declares the tags its response depends on (e.g. 'lists' or
+# 'list:3:tasks'). Each tag has a generation number that is part of the cache key,
+# so invalidating a tag just bumps its generation and every entry built from the
+# old data stops being reachable. This works the same for the in-process backend
+# and for a shared backend, where all workers see the bumped generation.
+#
+# CACHE_BACKEND selects the backend: 'memory' (default, per process), 'redis'
+# (shared, needs the redis package and CACHE_REDIS_URL), 'none', or a
+# 'module:Class' path to a custom backend with the same methods as MemoryBackend.
+
+GLOBAL_TAG = '*'
+
+class MemoryBackend:
+    def __init__(self, app):
+        self.max_entries = app.config['CACHE_MAX_ENTRIES']
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_generations(self, tags):
+        with self.lock:
+            return [self.generations.get(tag, 0) for tag in tags]
+
+    def bump_generations(self, tags):
+        with self.lock:
+            for tag in tags:
+                self.generations[tag] = self.generations.get(tag, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generations.clear()
+
+class RedisBackend:
+    # Entries expire through their TTL; size limits come from the Redis server's
+    # maxmemory with the volatile-lru policy, which never evicts the generation
+    # counters because they have no TTL
+    def __init__(self, app):
+        import redis
+        self.client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+        self.prefix = app.config['CACHE_KEY_PREFIX']
+
+    def get(self, key):
+        value = self.client.get(self.prefix + 'entry:' + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + 'entry:' + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def get_generations(self, tags):
+        return [int(value or 0) for value in self.client.mget([self.prefix + 'gen:' + tag for tag in tags])]
+
+    def bump_generations(self, tags):
+        pipeline = self.client.pipeline()
+        for tag in tags:
+            pipeline.incr(self.prefix + 'gen:' + tag)
+        pipeline.execute()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+BACKENDS = {'memory': MemoryBackend, 'redis': RedisBackend}
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 60)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('CACHE_KEY_PREFIX', 'tasklist:')
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+
+        name = app.config['CACHE_BACKEND']
+        if name == 'none':
+            self.backend = None
+        elif name in BACKENDS:
+            self.backend = BACKENDS[name](app)
+        else:
+            module, _, cls = name.partition(':')
+            self.backend = getattr(importlib.import_module(module), cls)(app)
+
+    def cached(self, tags, ttl=None):
+        # tags is called with the view arguments and returns the tags the response depends on
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Pages showing flash messages are personal and one-off
+                if self.backend is None or '_flashes' in session:
+                    return _conditional(make_response(view(**kwargs)))
+
+                entry_tags = [GLOBAL_TAG, *tags(**kwargs)]
+                generations = self.backend.get_generations(entry_tags)
+                key = request.full_path + '|' + ','.join(f'{tag}={generation}' for tag, generation in zip(entry_tags, generations))
+
+                entry = self.backend.get(key)
+                if entry is None:
+                    response = make_response(view(**kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    body = response.get_data()
+                    headers = [(name, value) for name, value in response.headers if name not in ('Content-Length', 'Set-Cookie')]
+                    entry = (body, headers, '"' + hashlib.sha1(body).hexdigest() + '"')
+                    self.backend.set(key, entry, ttl or self.default_ttl)
+
+                body, headers, etag = entry
+                response = make_response(body, 200, headers)
+                response.headers['ETag'] = etag
+                return _conditional(response)
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.backend.bump_generations(tags)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+def _conditional(response):
+    # Clients revalidate with If-None-Match and get an empty 304 when nothing changed
+    if response.status_code == 200 and not response.is_streamed:
+        if 'ETag' not in response.headers:
+            response.add_etag()
+        response.headers.setdefault('Cache-Control', 'no-cache')
+        response.make_conditional(request)
+    return response
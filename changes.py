@@ -0,0 +1,148 @@
+from flask import abort
+from app import app, db
+from models import Task, List, Tombstone, SyncState
+from serializers import serialize_rows, TASK_SCHEMA, LIST_SCHEMA
+from sqlalchemy import event, select, insert, update, delete, func
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import threading
+import time
+import click
+
+# Change tracking for incremental sync (/api/changes).
+#
+# Every transaction (every savepoint, in a non-atomic batch) that writes tasks or
+# lists takes the next number from the sync_state counter and stamps it on the
+# rows it inserts or updates, deleted rows leave a Tombstone with that revision.
+# Updating the counter row locks it until commit, so revisions become visible in
+# order and a client that has seen revision N can ask for everything after N
+# without missing a concurrent write.
+#
+# ORM changes are stamped by the before_flush hook below. The Core bulk writes of
+# the importer and datagen call transaction_revision() themselves.
+
+_changed = threading.Condition()
+
+def transaction_revision(session=None):
+    # One revision per transaction, allocated on first use. It is forgotten when a
+    # savepoint ends too, so each operation of a non-atomic batch gets its own.
+    session = session or db.session
+    if 'revision' not in session.info:
+        connection = session.connection()
+        table = SyncState.__table__
+        if connection.execute(update(table).where(table.c.id == 1).values(revision=table.c.revision + 1)).rowcount == 0:
+            connection.execute(insert(table).values(id=1, revision=1, pruned_revision=0))
+        session.info['revision'] = connection.execute(select(table.c.revision).where(table.c.id == 1)).scalar()
+        session.info['notify'] = True  # Wake long-polls once committed
+    return session.info['revision']
+
+@event.listens_for(db.session, 'before_flush')
+def _stamp_revisions(session, flush_context, instances):
+    changed = [obj for obj in session.new if isinstance(obj, (Task, List))]
+    changed += [obj for obj in session.dirty if isinstance(obj, (Task, List)) and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, (Task, List))]
+    if not changed and not deleted:
+        return
+    revision = transaction_revision(session)
+    for obj in changed:
+        obj.revision = revision
+    now = datetime.now()
+    for obj in deleted:
+        session.add(Tombstone(kind='task' if isinstance(obj, Task) else 'list', object_id=obj.id, revision=revision, deleted_at=now))
+
+@event.listens_for(db.session, 'after_commit')
+def _notify_waiters(session):
+    if session.info.pop('notify', False):
+        with _changed:
+            _changed.notify_all()
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _forget_revision(session, transaction):
+    # Also after a rolled back savepoint, whose counter update is undone with it
+    session.info.pop('revision', None)
+
+def sync_state():
+    # On a connection of its own, so long-polling never sees a stale snapshot
+    with db.engine.connect() as connection:
+        row = connection.execute(select(SyncState.revision, SyncState.pruned_revision).where(SyncState.id == 1)).first()
+    return (row.revision, row.pruned_revision) if row else (0, 0)
+
+def wait_for_changes(since, timeout):
+    # Wakes up right away for commits in this process and polls the counter for
+    # commits made by other worker processes
+    deadline = time.monotonic() + timeout
+    while sync_state()[0] <= since:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        with _changed:
+            _changed.wait(min(remaining, app.config['CHANGES_POLL_INTERVAL']))
+    return True
+
+def _page_end(since, current, limit):
+    # Returns the last revision whose rows still fit in limit. Revisions are
+    # never split, so a single large one (e.g. an import chunk) may exceed it.
+    # The first limit + 1 revisions of each table are read in index order and
+    # merged here, grouping all rows after since would sort them in a temporary
+    # B-tree on every page.
+    revisions = list(itertools.islice(heapq.merge(*[
+        db.session.execute(page_revisions_query(model, since, current, limit + 1)).scalars().all()
+        for model in (Task, List, Tombstone)
+    ]), limit + 1))
+    if len(revisions) <= limit:
+        return current
+    # The revision of the first row past the limit doesn't fit, unless it is the only one
+    overflow = revisions[limit]
+    fitting = [revision for revision in revisions[:limit] if revision < overflow]
+    return fitting[-1] if fitting else overflow
+
+def page_revisions_query(model, since, current, limit):
+    return select(model.revision).where(model.revision > since, model.revision <= current).order_by(model.revision).limit(limit)
+
+def changed_rows_query(model, fields, since, end):
+    return select(*[getattr(model, field) for field in fields]).where(model.revision > since, model.revision <= end).order_by(model.revision, model.id)
+
+def get_changes(since, limit, pruned_seen=None):
+    # pruned_seen comes from the cursor of an earlier page: the prune horizon that
+    # page was served under. Only a prune since then invalidates the sync.
+    current, pruned = sync_state()
+    if 0 < since < pruned and (pruned_seen is None or pruned_seen < pruned):
+        abort(410, description=f"Changes before revision {pruned} are no longer available, sync again from since=0")
+    end = _page_end(since, current, limit) if since < current else current
+
+    def rows(model, fields):
+        return serialize_rows(db.session.execute(changed_rows_query(model, fields, since, end)), fields)
+
+    tasks = rows(Task, TASK_SCHEMA + ('revision',))
+    lists = rows(List, LIST_SCHEMA + ('revision',))
+    deleted = {'tasks': [], 'lists': []}
+    if since > 0:
+        # An id deleted and created again within the window is reported as changed
+        present = {'task': {task['id'] for task in tasks}, 'list': {list['id'] for list in lists}}
+        tombstones = db.session.execute(
+            select(Tombstone.kind, Tombstone.object_id).where(Tombstone.revision > since, Tombstone.revision <= end).order_by(Tombstone.revision)
+        )
+        for kind, object_id in tombstones:
+            if object_id not in present[kind]:
+                deleted[kind + 's'].append(object_id)
+    next_key = [end, pruned] if end < current else None
+    return {'since': since, 'revision': end, 'has_more': end < current, 'next_key': next_key, 'tasks': tasks, 'lists': lists, 'deleted': deleted}
+
+def prune_tombstones(older_than):
+    # Clients that last synced before the newest pruned tombstone get 410 and sync from scratch,
+    # syncs already paging with a cursor from before the prune are sent back too
+    newest = db.session.execute(select(func.max(Tombstone.revision)).where(Tombstone.deleted_at < older_than)).scalar()
+    if newest is None:
+        return 0
+    removed = db.session.execute(delete(Tombstone).where(Tombstone.revision <= newest)).rowcount
+    db.session.execute(update(SyncState).where(SyncState.id == 1).values(pruned_revision=newest))
+    db.session.commit()
+    return removed
+
+@app.cli.command('changes-prune')
+@click.option('--days', type=int, default=30, show_default=True, help='Remove tombstones of deletions older than this.')
+def changes_prune_command(days):
+    """Delete old tombstones from the change feed."""
+    removed = prune_tombstones(datetime.now() - timedelta(days=days))
+    click.echo(f"Removed {removed} tombstones")
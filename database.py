@@ -0,0 +1,95 @@
+import os
+import re
+import sqlite3
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+# Engine configuration from the environment. DATABASE_URL selects the database
+# (SQLite by default, PostgreSQL for deployments with several app nodes), the
+# DB_POOL_* variables size the connection pool, and the SQLITE_* variables set
+# the pragmas applied to every new SQLite connection. Set a pragma variable to
+# an empty string to keep SQLite's default.
+
+DEFAULT_DATABASE_URL = 'sqlite:///tasks.db'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': ('SQLITE_JOURNAL_MODE', 'WAL'),       # Readers no longer block the writer
+    'synchronous': ('SQLITE_SYNCHRONOUS', 'NORMAL'),      # Safe with WAL, no fsync on every commit
+    'busy_timeout': ('SQLITE_BUSY_TIMEOUT', '5000'),      # Wait for the write lock instead of "database is locked"
+    'cache_size': ('SQLITE_CACHE_SIZE', '-65536'),        # Negative values are KiB, so 64 MiB
+    'mmap_size': ('SQLITE_MMAP_SIZE', '268435456'),       # 256 MiB of memory-mapped I/O
+    'temp_store': ('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
+POOL_OPTIONS = {
+    'pool_size': ('DB_POOL_SIZE', int),
+    'max_overflow': ('DB_MAX_OVERFLOW', int),
+    'pool_timeout': ('DB_POOL_TIMEOUT', int),
+    'pool_recycle': ('DB_POOL_RECYCLE', int),
+}
+
+_active_pragmas = {}
+
+def database_url():
+    url = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    # Hosting providers commonly hand out postgres:// URLs, which SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def sqlite_pragmas():
+    pragmas = {}
+    for pragma, (variable, default) in SQLITE_PRAGMAS.items():
+        value = os.environ.get(variable, default).strip()
+        if not value:
+            continue
+        if not re.fullmatch(r'-?\w+', value):
+            raise ValueError(f"Invalid value for {variable}: {value!r}")
+        pragmas[pragma] = value
+    return pragmas
+
+def engine_options(url):
+    options = {}
+    for option, (variable, convert) in POOL_OPTIONS.items():
+        if os.environ.get(variable):
+            options[option] = convert(os.environ[variable])
+    if not url.startswith('sqlite'):
+        # Drop connections the server closed while they sat idle in the pool
+        options['pool_pre_ping'] = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    return options
+
+def configure_database(app):
+    # Must run before SQLAlchemy(app) so the engine is created with these settings
+    url = database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    app.config['SQLITE_PRAGMAS'] = sqlite_pragmas() if url.startswith('sqlite') else {}
+    _active_pragmas.clear()
+    _active_pragmas.update(app.config['SQLITE_PRAGMAS'])
+
+def apply_sqlite_pragmas(dbapi_connection):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in _active_pragmas.items():
+        cursor.execute(f'PRAGMA {pragma}={value}')
+    cursor.close()
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        apply_sqlite_pragmas(dbapi_connection)
+
+def begin_write_transaction(connection):
+    # pysqlite only opens a transaction by itself before INSERT/UPDATE/DELETE. A
+    # SAVEPOINT issued first would start one of its own whose RELEASE commits,
+    # so callers that use savepoints open the outer transaction explicitly.
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+def sync_id_sequences(session, tables):
+    # Rows written with explicit ids (imports, generated data) are not seen by
+    # PostgreSQL's id sequences, which would hand out those ids again
+    if session.get_bind().dialect.name != 'postgresql':
+        return
+    for table in tables:
+        session.execute(text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), coalesce(max(id), 1)) FROM {table.name}"))
+    session.commit()
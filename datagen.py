@@ -0,0 +1,80 @@
+from app import app, db, cache
+from models import Task, List
+from cache import GLOBAL_TAG
+import changes
+from database import sync_id_sequences
+from sqlalchemy import select, insert, func
+from datetime import date, timedelta
+import random
+import click
+
+# Synthetic data for load and benchmark runs: N lists x M tasks with due dates
+# spread around today and a realistic mix of done, open and overdue tasks.
+# Rows are written with Core executemany inserts in batches, one commit per batch.
+
+VERBS = ['Fix', 'Clean', 'Buy', 'Call', 'Review', 'Schedule', 'Pay', 'Book', 'Prepare', 'Renew', 'Order', 'Plan', 'Update', 'Check', 'Email']
+NOUNS = ['the car', 'groceries', 'the report', 'the dentist', 'insurance', 'the garden', 'slides', 'the invoice', 'tickets', 'the passport', 'the budget', 'the windows', 'the team', 'the roof', 'the bike']
+LIST_NAMES = ['Housework', 'Gardenwork', 'Work', 'Shopping', 'Fitness', 'Car Maintenance', 'Hobbies', 'Travel', 'Finances', 'Health']
+
+def _due_date(rng, today):
+    # Most tasks are due within the next few weeks, a long tail is due later and
+    # roughly a fifth lie in the past
+    roll = rng.random()
+    if roll < 0.2:
+        return today - timedelta(days=rng.randint(1, 60))
+    if roll < 0.3:
+        return today
+    if roll < 0.85:
+        return today + timedelta(days=int(rng.expovariate(1 / 10)) + 1)
+    return today + timedelta(days=rng.randint(60, 365))
+
+def generate_data(num_lists, tasks_per_list, seed=0, batch_size=10000, progress=None):
+    rng = random.Random(seed)
+    today = date.today()
+    next_list_id = (db.session.execute(select(func.max(List.id))).scalar() or 0) + 1
+    next_task_id = (db.session.execute(select(func.max(Task.id))).scalar() or 0) + 1
+    lists_per_batch = max(1, batch_size // max(tasks_per_list, 1))
+    written = {'lists': 0, 'tasks': 0}
+
+    for first in range(0, num_lists, lists_per_batch):
+        list_rows, task_rows = [], []
+        revision = changes.transaction_revision()
+        for list_id in range(next_list_id + first, next_list_id + min(first + lists_per_batch, num_lists)):
+            created = today - timedelta(days=rng.randint(0, 365))
+            list_rows.append({'id': list_id, 'title': f'{rng.choice(LIST_NAMES)} {list_id}', 'description': f'Generated list {list_id}', 'created_date': created, 'revision': revision})
+            for _ in range(tasks_per_list):
+                due = _due_date(rng, today)
+                # Past tasks are mostly done, future ones mostly open
+                status = rng.random() < (0.75 if due < today else 0.15)
+                task_rows.append({
+                    'id': next_task_id,
+                    'title': f'{rng.choice(VERBS)} {rng.choice(NOUNS)}',
+                    'status': status,
+                    'due_date': due,
+                    'created_date': min(due, today) - timedelta(days=rng.randint(0, 30)),
+                    'list_id': list_id,
+                    'revision': revision
+                })
+                next_task_id += 1
+
+        db.session.execute(insert(List.__table__), list_rows)
+        if task_rows:
+            db.session.execute(insert(Task.__table__), task_rows)
+        db.session.commit()
+        written['lists'] += len(list_rows)
+        written['tasks'] += len(task_rows)
+        if progress:
+            progress(written)
+
+    sync_id_sequences(db.session, (List.__table__, Task.__table__))
+    cache.invalidate(GLOBAL_TAG)
+    return written
+
+@app.cli.command('generate-data')
+@click.option('--lists', 'num_lists', type=int, default=1000, show_default=True, help='Number of lists to create.')
+@click.option('--tasks-per-list', type=int, default=100, show_default=True, help='Tasks created in every list.')
+@click.option('--seed', type=int, default=0, show_default=True, help='Random seed, the same seed gives the same data.')
+def generate_data_command(num_lists, tasks_per_list, seed):
+    """Bulk-load synthetic lists and tasks for benchmarks."""
+    written = generate_data(num_lists, tasks_per_list, seed=seed, progress=lambda written: click.echo(f"{written['lists']} lists, {written['tasks']} tasks"))
+    click.echo(f"Generated {written['lists']} lists and {written['tasks']} tasks")
@@ -0,0 +1,39 @@
+# gunicorn.conf.py
+#
+# Multi-process serving for the app:  gunicorn -c gunicorn.conf.py wsgi:app
+# The async read API (asgi.py) runs under the same settings with
+#   gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+#
+# Send SIGHUP to the master process for a graceful reload: new workers are started
+# with fresh code and configuration while the old ones finish their requests.
+
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+
+# Processes give real parallelism; threads let each process overlap requests
+# that wait on SQLite or slow clients
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+
+# The default memory cache lives in each worker, and an invalidation only reaches
+# the worker that made the change, so the others would keep serving stale pages.
+# With several workers, cache only when a backend is chosen explicitly (redis).
+if workers > 1:
+    os.environ.setdefault('CACHE_BACKEND', 'none')
+
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers now and then so slow leaks can't accumulate
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 1000))
+
+# Each worker opens its own database connections after the fork
+preload_app = False
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+errorlog = '-'
@@ -2,8 +2,17 @@
 
 from app import app, db
 from models import Task, List  # Import both models
+from migrations import upgrade
+from datagen import generate_data
 from sqlalchemy.exc import OperationalError
 from datetime import date, timedelta
+import argparse
+
+parser = argparse.ArgumentParser(description="Create the database and add sample data.")
+parser.add_argument('--lists', type=int, help="Generate this many synthetic lists instead of the sample data.")
+parser.add_argument('--tasks-per-list', type=int, default=100, help="Tasks per generated list (default: 100).")
+parser.add_argument('--seed', type=int, default=0, help="Random seed for the generated data (default: 0).")
+args = parser.parse_args()
 
 def is_db_initialized():
     # Check if any rows exist in the List table
@@ -15,9 +24,14 @@ def is_db_initialized():
 
 # Create an application context
 with app.app_context():
-    if not is_db_initialized():
-        # Initialize the database
-        db.create_all()
+    # Create missing tables and bring existing databases up to the current schema
+    for version, description in upgrade():
+        print(f"Applied migration {version}: {description}")
+
+    if args.lists:
+        written = generate_data(args.lists, args.tasks_per_list, seed=args.seed, progress=lambda written: print(f"{written['lists']} lists, {written['tasks']} tasks"))
+        print(f"Database loaded with {written['lists']} generated lists and {written['tasks']} tasks.")
+    elif not is_db_initialized():
 
         # Create sample data for Lists
         list1 = List(title="Housework", description="Stuff to do around the house", created_date=date.today())
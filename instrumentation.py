@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from collections import Counter
+from flask import g, request, has_request_context, before_render_template, template_rendered, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request performance instrumentation:
+#   - SQL statement count and cumulative DB time from SQLAlchemy engine events
+#   - template render time and total handler time
+#   - Server-Timing response headers, e.g. "db;dur=3.1;desc="4 queries", tpl;dur=1.2, total;dur=6.0"
+#   - structured slow request / slow query log lines and N+1 warnings when one
+#     statement runs more than PERF_N_PLUS_ONE_THRESHOLD times in a request
+#   - Prometheus histograms per route at /metrics (per process)
+# For streamed responses (e.g. /api/export) the Server-Timing header can only cover
+# the handler, while metrics and logs are recorded once the body has been sent.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            counts, total, observations = self.series.get(labels, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self.series[labels] = (counts, total + value, observations + 1)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for labels, (counts, total, observations) in sorted(self.series.items()):
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {observations}')
+                lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+                lines.append(f'{self.name}_count{{{label_text}}} {observations}')
+        return lines
+
+class RequestMetrics:
+    def __init__(self, app=None):
+        self.request_duration = Histogram('http_request_duration_seconds', 'Request time per route.', DURATION_BUCKETS)
+        self.db_duration = Histogram('http_request_db_duration_seconds', 'Cumulative SQL time per request.', DURATION_BUCKETS)
+        self.db_queries = Histogram('http_request_db_queries', 'SQL statements executed per request.', QUERY_COUNT_BUCKETS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PERF_SLOW_REQUEST_MS', 500)
+        app.config.setdefault('PERF_SLOW_QUERY_MS', 100)
+        app.config.setdefault('PERF_N_PLUS_ONE_THRESHOLD', 20)
+        app.config.setdefault('PERF_SERVER_TIMING', True)
+        self.app = app
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+        event.listen(Engine, 'before_cursor_execute', self._start_query)
+        event.listen(Engine, 'after_cursor_execute', self._finish_query)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def _start_request(self):
+        g.perf = {'started': time.perf_counter(), 'queries': 0, 'db_time': 0.0, 'render_time': 0.0, 'statements': Counter()}
+
+    def _start_render(self, sender, template, context, **extra):
+        if 'perf' in g:
+            g.perf['render_started'] = time.perf_counter()
+
+    def _finish_render(self, sender, template, context, **extra):
+        if 'perf' in g and 'render_started' in g.perf:
+            g.perf['render_time'] += time.perf_counter() - g.perf.pop('render_started')
+
+    def _start_query(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _finish_query(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        if not has_request_context() or 'perf' not in g:
+            return
+        g.perf['queries'] += 1
+        g.perf['db_time'] += elapsed
+        g.perf['statements'][statement] += 1
+        if elapsed * 1000 >= self.app.config['PERF_SLOW_QUERY_MS']:
+            self._log('slow_query', {'route': _route(), 'duration_ms': round(elapsed * 1000, 2), 'statement': statement})
+
+    def _finish_request(self, response):
+        perf = g.get('perf')
+        if perf is None:
+            return response
+        info = {'method': request.method, 'path': request.full_path.rstrip('?'), 'route': _route(), 'status': response.status_code}
+
+        if self.app.config['PERF_SERVER_TIMING']:
+            response.headers.add('Server-Timing', f'db;dur={perf["db_time"] * 1000:.2f};desc="{perf["queries"]} queries"')
+            response.headers.add('Server-Timing', f'tpl;dur={perf["render_time"] * 1000:.2f}')
+            response.headers.add('Server-Timing', f'total;dur={(time.perf_counter() - perf["started"]) * 1000:.2f}')
+
+        # Streamed bodies keep querying after this point, so record them once closed
+        if response.is_streamed:
+            response.call_on_close(lambda: self._record(perf, info))
+        else:
+            self._record(perf, info)
+        return response
+
+    def _record(self, perf, info):
+        total = time.perf_counter() - perf['started']
+        labels = (('method', info['method']), ('route', info['route']), ('status', str(info['status'])))
+        self.request_duration.observe(labels, total)
+        self.db_duration.observe(labels, perf['db_time'])
+        self.db_queries.observe(labels, perf['queries'])
+
+        if total * 1000 >= self.app.config['PERF_SLOW_REQUEST_MS']:
+            self._log('slow_request', dict(
+                info,
+                duration_ms=round(total * 1000, 2),
+                db_ms=round(perf['db_time'] * 1000, 2),
+                render_ms=round(perf['render_time'] * 1000, 2),
+                queries=perf['queries']
+            ))
+
+        threshold = self.app.config['PERF_N_PLUS_ONE_THRESHOLD']
+        for statement, count in perf['statements'].items():
+            if count > threshold:
+                self._log('n_plus_one', {'route': info['route'], 'count': count, 'statement': statement})
+
+    def _log(self, kind, record):
+        self.app.logger.warning('%s %s', kind, json.dumps(record))
+
+    def metrics_view(self):
+        lines = []
+        for histogram in (self.request_duration, self.db_duration, self.db_queries):
+            lines.extend(histogram.render())
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
@@ -0,0 +1,208 @@
+from flask import abort
+from app import app, db
+from models import Job
+from sqlalchemy import select, update
+from werkzeug.exceptions import HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import glob
+import os
+import shutil
+import threading
+import time
+import uuid
+import click
+
+# Background jobs for long operations such as imports and exports. A job runs on
+# a thread pool in the process that accepted it, while its state lives in the job
+# table, so any worker process can report progress or take a cancellation request.
+#
+# Job functions receive the Job and a JobProgress. Calling progress.update()
+# between units of work records counts (throttled to JOB_PROGRESS_INTERVAL) and
+# raises JobCancelled once cancellation was requested, so jobs only stop at points
+# where that is safe. Work committed before that point is kept.
+#
+# A process that dies (worker recycling, reloads, container restarts) takes its
+# jobs' threads with it. Every process therefore touches heartbeat_at of the jobs
+# it holds every JOB_HEARTBEAT_INTERVAL, and a queued or running job whose
+# heartbeat is older than JOB_STALE_AFTER is marked failed when it is read.
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+UPLOAD_SUFFIX = '.upload'
+
+_executor = None
+_executor_lock = threading.Lock()
+_held = set()  # Ids of the queued and running jobs of this process
+_held_lock = threading.Lock()
+
+class JobCancelled(Exception):
+    pass
+
+class JobProgress:
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.last_write = 0.0
+
+    def update(self, counts, rows, done=None, total=None, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_write < app.config['JOB_PROGRESS_INTERVAL']:
+            return
+        self.last_write = now
+        # A connection of its own, so progress never commits the job's own session
+        # (an export is still streaming from it)
+        with db.engine.begin() as connection:
+            connection.execute(update(Job).where(Job.id == self.job_id).values(counts=counts, rows=rows, done=done, total=total))
+            cancel_requested = connection.execute(select(Job.cancel_requested).where(Job.id == self.job_id)).scalar()
+        if cancel_requested:
+            raise JobCancelled()
+
+def executor():
+    # Created on first use, so every worker process gets its own threads after the fork
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config['JOB_WORKERS'], thread_name_prefix='job')
+            threading.Thread(target=_heartbeat, name='job-heartbeat', daemon=True).start()
+        return _executor
+
+def _heartbeat():
+    while True:
+        time.sleep(app.config['JOB_HEARTBEAT_INTERVAL'])
+        with _held_lock:
+            held = list(_held)
+        if not held:
+            continue
+        try:
+            with app.app_context(), db.engine.begin() as connection:
+                connection.execute(update(Job).where(Job.id.in_(held)).values(heartbeat_at=datetime.now()))
+        except Exception:
+            app.logger.exception("Could not record the heartbeat of jobs %s", ', '.join(held))
+
+def job_path(job_id, suffix):
+    os.makedirs(app.config['JOB_DIR'], exist_ok=True)
+    return os.path.join(app.config['JOB_DIR'], job_id + suffix)
+
+def submit(kind, function, params=None, upload=None):
+    # An upload (e.g. the request stream) is saved first, since the request is
+    # over by the time the job runs. The function finds it at job_path(job.id, UPLOAD_SUFFIX).
+    now = datetime.now()
+    job = Job(id=uuid.uuid4().hex, kind=kind, status='queued', params=params or {}, counts={}, created_at=now, heartbeat_at=now)
+    if upload is not None:
+        with open(job_path(job.id, UPLOAD_SUFFIX), 'wb') as f:
+            shutil.copyfileobj(upload, f, 1024 * 1024)
+    db.session.add(job)
+    db.session.commit()
+    with _held_lock:
+        _held.add(job.id)
+    executor().submit(_run, job.id, function)
+    return job
+
+def _run(job_id, function):
+    try:
+        _run_job(job_id, function)
+    finally:
+        with _held_lock:
+            _held.discard(job_id)
+
+def _run_job(job_id, function):
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        if job.status != 'queued':
+            return  # Cancelled while waiting for a thread, or given up as stale
+        job.status = 'running'
+        job.started_at = job.heartbeat_at = datetime.now()
+        db.session.commit()
+
+        values = {}
+        try:
+            values['result'] = function(job, JobProgress(job_id))
+            values['status'] = 'succeeded'
+        except JobCancelled:
+            values['status'] = 'cancelled'
+        except HTTPException as e:
+            values['status'], values['error'] = 'failed', e.description
+        except Exception as e:
+            app.logger.exception("Job %s (%s) failed", job_id, job.kind)
+            values['status'], values['error'] = 'failed', f"{type(e).__name__}: {e}"
+        finally:
+            db.session.rollback()
+            upload = os.path.join(app.config['JOB_DIR'], job_id + UPLOAD_SUFFIX)
+            if os.path.exists(upload):
+                os.remove(upload)
+
+        if isinstance(values.get('result'), dict) and 'file' in values['result']:
+            values['result_path'] = values['result'].pop('file')
+        values['finished_at'] = datetime.now()
+        db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.session.commit()
+
+def get_job(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        abort(404)
+    fail_stale_jobs([job])
+    return job
+
+def fail_stale_jobs(jobs):
+    # Marks queued or running jobs whose process stopped sending heartbeats as
+    # failed and removes their files. Only writes when one of them is stale.
+    cutoff = datetime.now() - timedelta(seconds=app.config['JOB_STALE_AFTER'])
+    stale = [job for job in jobs if job.status not in FINISHED_STATUSES and (job.heartbeat_at or job.created_at) < cutoff]
+    for job in stale:
+        job.status = 'failed'
+        job.error = "The process running this job stopped before it finished"
+        job.finished_at = datetime.now()
+        for path in glob.glob(os.path.join(app.config['JOB_DIR'], glob.escape(job.id) + '.*')):
+            os.remove(path)
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+def cancel_job(job):
+    if job.status in FINISHED_STATUSES:
+        return False
+    job.cancel_requested = True
+    if job.status == 'queued':
+        job.status = 'cancelled'
+        job.finished_at = datetime.now()
+    db.session.commit()
+    return True
+
+def job_data(job):
+    elapsed = ((job.finished_at or datetime.now()) - job.started_at).total_seconds() if job.started_at else None
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'params': job.params,
+        'counts': job.counts,
+        'rows': job.rows,
+        'percent': round(100 * job.done / job.total, 1) if job.total else (100.0 if job.status == 'succeeded' else None),
+        'elapsed_seconds': round(elapsed, 3) if elapsed is not None else None,
+        'rows_per_second': round(job.rows / elapsed, 1) if elapsed else None,
+        'result': job.result,
+        'error': job.error,
+        'cancel_requested': job.cancel_requested,
+        'created_at': job.created_at.isoformat(timespec='seconds'),
+        'started_at': job.started_at.isoformat(timespec='seconds') if job.started_at else None,
+        'finished_at': job.finished_at.isoformat(timespec='seconds') if job.finished_at else None,
+    }
+
+def prune_jobs(older_than):
+    # Removes finished jobs created before the cutoff, along with their result files
+    removed = 0
+    for job in db.session.execute(select(Job).where(Job.status.in_(FINISHED_STATUSES), Job.created_at < older_than)).scalars():
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        db.session.delete(job)
+        removed += 1
+    db.session.commit()
+    return removed
+
+@app.cli.command('jobs-prune')
+@click.option('--days', type=int, default=7, show_default=True, help='Remove finished jobs older than this.')
+def jobs_prune_command(days):
+    """Delete finished background jobs and their export files."""
+    removed = prune_jobs(datetime.now() - timedelta(days=days))
+    click.echo(f"Removed {removed} jobs")
@@ -0,0 +1,177 @@
+import codecs
+import io
+import json
+import re
+
+# Incremental readers for import files, so a backup never has to be parsed
+# into memory as a whole. Both formats yield one list (with its tasks) at a time:
+#   - ndjson: one list object per line (what /api/export?format=ndjson writes)
+#   - json:   the nested list-of-lists array written by /api/export
+#   - columnar: the column-array document of /api/export?format=columnar. It is
+#     read whole, its blocks are only regrouped into lists with their tasks.
+
+READ_SIZE = 64 * 1024
+MAX_ELEMENT_SIZE = 64 * 1024 * 1024  # One list with its tasks, or one ndjson line
+TOKEN_TAIL = 8  # A token cut off by the end of a chunk fails this close to its end (e.g. 'tru', '1e', '\\u12')
+FORMATS = ('json', 'ndjson', 'columnar')
+COLUMNAR_HEAD = re.compile(rb'\s*\{\s*"format"\s*:\s*"columnar"')
+
+class JSONStreamError(ValueError):
+    pass
+
+def _read_chunks(stream, read_size=READ_SIZE):
+    while True:
+        chunk = stream.read(read_size)
+        if not chunk:
+            return
+        yield chunk
+
+def iter_ndjson(stream):
+    buffer = b''
+    line_number = 0
+    for chunk in _read_chunks(stream):
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _loads(line, line_number)
+        if len(buffer) > MAX_ELEMENT_SIZE:
+            raise JSONStreamError(f"Line {line_number + 1} is longer than {MAX_ELEMENT_SIZE} bytes")
+    if buffer.strip():
+        yield _loads(buffer, line_number + 1)
+
+def _loads(line, line_number):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise JSONStreamError(f"Invalid JSON on line {line_number}: {e}") from None
+
+def iter_json_array(stream):
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    read_size = READ_SIZE
+    buffer = ''
+    pos = 0
+    eof = False
+    state = 'start'  # start -> first -> value/separator -> end
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = stream.read(read_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+        pos = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                if state == 'end':
+                    return
+                raise JSONStreamError("Unexpected end of JSON array")
+            fill()
+            continue
+
+        char = buffer[pos]
+        if state == 'start':
+            if char != '[':
+                raise JSONStreamError("Expected a JSON array")
+            pos += 1
+            state = 'first'
+        elif state in ('first', 'separator') and char == ']':
+            pos += 1
+            state = 'end'
+        elif state == 'separator':
+            if char != ',':
+                raise JSONStreamError(f"Expected ',' or ']' but found {char!r}")
+            pos += 1
+            state = 'value'
+        elif state in ('first', 'value'):
+            try:
+                value, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Read on only if the element may continue in the next chunk, a
+                # syntax error further back fails without reading the rest
+                if eof or not _truncated(e, buffer):
+                    raise JSONStreamError(f"Invalid JSON array element: {e}") from None
+                if len(buffer) - pos > MAX_ELEMENT_SIZE:
+                    raise JSONStreamError(f"JSON array element is longer than {MAX_ELEMENT_SIZE} characters") from None
+                # Grow the reads so a very large element is not re-parsed once per chunk
+                read_size *= 2
+                fill()
+                continue
+            read_size = READ_SIZE
+            state = 'separator'
+            yield value
+        else:
+            raise JSONStreamError(f"Unexpected data after JSON array: {char!r}")
+
+def _truncated(error, buffer):
+    # An unterminated string ran into the end of the buffer
+    return error.msg.startswith('Unterminated string') or error.pos >= len(buffer) - TOKEN_TAIL
+
+def is_columnar(document):
+    return isinstance(document, dict) and document.get('format') == 'columnar'
+
+def iter_columnar(document):
+    if document.get('version') != 1:
+        raise JSONStreamError(f"Unsupported columnar version {document.get('version')!r}")
+    blocks = document.get('blocks', [])
+    if not isinstance(blocks, list) or not all(isinstance(block, dict) for block in blocks):
+        raise JSONStreamError("Columnar blocks must be a list of objects")
+    lists = {}
+    for block in blocks:
+        # A list comes in the block of its first task, its tasks may continue in later blocks
+        for list_data in _columns_to_rows(block.get('lists', {}), 'lists'):
+            list_data['tasks'] = []
+            lists[list_data['id']] = list_data
+        for task_data in _columns_to_rows(block.get('tasks', {}), 'tasks'):
+            list_id = task_data.pop('list_id', None)
+            if not _is_id(list_id) or list_id not in lists:
+                raise JSONStreamError(f"Task {task_data['id']!r} refers to unknown list {list_id!r}")
+            lists[list_id]['tasks'].append(task_data)
+    return iter(lists.values())
+
+def _columns_to_rows(columns, name):
+    if not isinstance(columns, dict) or not all(isinstance(values, list) for values in columns.values()):
+        raise JSONStreamError(f"Block {name} must be an object of column arrays")
+    if len({len(values) for values in columns.values()}) > 1:
+        raise JSONStreamError(f"Columns of block {name} differ in length")
+    if columns and 'id' not in columns:
+        raise JSONStreamError(f"Block {name} has no id column")
+    if not all(_is_id(value) for value in columns.get('id', [])):
+        raise JSONStreamError(f"Column id of block {name} must hold integers")
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def detect_format(stream):
+    # Sniffs the first non-whitespace byte without consuming it
+    head = stream.peek(READ_SIZE)
+    if COLUMNAR_HEAD.match(head):
+        return 'columnar'
+    return 'json' if head.lstrip()[:1] == b'[' else 'ndjson'
+
+def iter_lists(stream, format=None):
+    if not hasattr(stream, 'peek'):
+        stream = io.BufferedReader(stream, READ_SIZE)
+    if format is None:
+        format = detect_format(stream)
+    if format == 'ndjson':
+        return iter_ndjson(stream)
+    if format == 'json':
+        return iter_json_array(stream)
+    if format == 'columnar':
+        try:
+            document = json.load(stream)
+        except ValueError as e:
+            raise JSONStreamError(f"Invalid JSON: {e}") from None
+        if not is_columnar(document):
+            raise JSONStreamError("Expected a columnar export document")
+        return iter_columnar(document)
+    raise JSONStreamError(f"Unknown format {format!r}, expected one of: {', '.join(FORMATS)}")
@@ -0,0 +1,170 @@
+# loadtest.py
+#
+# Throughput of the production server at several worker counts. For every count a
+# gunicorn instance (gunicorn.conf.py) is started against the same SQLite file
+# filled by datagen.generate_data, and a pool of client threads sends keep-alive
+# GET requests to the read endpoints for a fixed duration.
+#
+#   python loadtest.py --workers 1,2,4 --concurrency 16 --duration 10
+#   python loadtest.py --app asgi:application --worker-class uvicorn.workers.UvicornWorker
+#
+# Unlike benchmark.py this goes through real HTTP, so it measures the server and
+# the process model as well as the application.
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from benchmark import percentile
+
+PATHS = [
+    lambda list_ids: '/api/lists',  # The plain list, tasks and export requests are the ones asgi.py serves itself
+    lambda list_ids: '/api/tasks',
+    lambda list_ids: '/api/export',
+    lambda list_ids: '/api/lists?limit=50',
+    lambda list_ids: '/api/tasks?limit=100',
+    lambda list_ids: f'/api/tasks_by_list_id/{random.choice(list_ids)}',
+    lambda list_ids: f'/api/lists/{random.choice(list_ids)}',
+]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def prepare_database(path, num_lists, tasks_per_list):
+    # Runs in a subprocess so this process never opens the database itself
+    code = (
+        "from app import app, db\n"
+        "from models import List\n"
+        "from migrations import upgrade\n"
+        "from datagen import generate_data\n"
+        "import json\n"
+        "with app.app_context():\n"
+        f"    upgrade(); generate_data({num_lists}, {tasks_per_list})\n"
+        "    print(json.dumps([row[0] for row in db.session.query(List.id)]))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True, env=dict(os.environ, DATABASE_URL='sqlite:///' + path), cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def start_server(args, workers, port, database_path):
+    env = dict(
+        os.environ,
+        DATABASE_URL='sqlite:///' + database_path,
+        WEB_BIND=f'127.0.0.1:{port}',
+        WEB_WORKERS=str(workers),
+        WEB_THREADS=str(args.threads),
+        WEB_WORKER_CLASS=args.worker_class,
+        WEB_ACCESS_LOG='/dev/null',
+        CACHE_BACKEND=os.environ.get('CACHE_BACKEND', 'none'),
+        PERF_SLOW_REQUEST_MS='1e9',
+    )
+    server = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', args.app], env=env, cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/api/lists?limit=1')
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"gunicorn with {workers} workers did not start")
+
+def client(port, list_ids, stop_at, durations, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.monotonic() < stop_at:
+        path = random.choice(PATHS)(list_ids)
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        if response.status >= 400:
+            errors.append(path)
+        else:
+            durations.append(time.perf_counter() - started)
+    connection.close()
+
+def run_load(port, list_ids, concurrency, duration):
+    durations, errors = [], []
+    stop_at = time.monotonic() + duration
+    threads = [threading.Thread(target=client, args=(port, list_ids, stop_at, durations, errors)) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(durations),
+        'errors': len(errors),
+        'throughput_rps': round(len(durations) / elapsed, 1),
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 3) if durations else None,
+        'p99_ms': round(percentile(durations, 0.99) * 1000, 3) if durations else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how throughput scales with the number of server workers.")
+    parser.add_argument('--workers', default='1,2,4', help="Comma separated worker counts (default: 1,2,4).")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per worker (default: 4).")
+    parser.add_argument('--concurrency', type=int, default=16, help="Client threads sending requests (default: 16).")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds of load per worker count (default: 10).")
+    parser.add_argument('--size', default='1000x20', help="LISTSxTASKS_PER_LIST of generated data (default: 1000x20).")
+    parser.add_argument('--app', default='wsgi:app', help="Application to serve (default: wsgi:app).")
+    parser.add_argument('--worker-class', default='gthread', help="Gunicorn worker class (default: gthread).")
+    parser.add_argument('--output', default='loadtest_results.json', help="Where to write the JSON results.")
+    args = parser.parse_args()
+
+    random.seed(0)
+    num_lists, tasks_per_list = (int(part) for part in args.size.split('x'))
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'app': args.app,
+        'worker_class': args.worker_class,
+        'threads': args.threads,
+        'concurrency': args.concurrency,
+        'size': args.size,
+        'workers': {}
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        database_path = os.path.join(workdir, 'load.db')
+        print(f"Generating {args.size}...", file=sys.stderr)
+        list_ids = prepare_database(database_path, num_lists, tasks_per_list)
+        for workers in (int(count) for count in args.workers.split(',')):
+            port = free_port()
+            server = start_server(args, workers, port, database_path)
+            try:
+                run_load(port, list_ids, args.concurrency, min(2, args.duration))  # Warm-up
+                stats = run_load(port, list_ids, args.concurrency, args.duration)
+            finally:
+                server.terminate()
+                server.wait()
+            results['workers'][str(workers)] = stats
+            print(f"  {workers:>3} workers  {stats['throughput_rps']:>8} req/s  p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms  {stats['errors']} errors", file=sys.stderr)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+from app import app, db
+from models import Task, List, Tombstone
+from sqlalchemy import text, inspect
+from datetime import date
+import click
+import search
+
+# Versioned schema migrations. db.create_all() only creates missing tables, so
+# anything that changes an existing table (indexes, columns) is added here and
+# applied once per database, in order, recording each version in schema_migrations.
+
+MIGRATIONS = []
+
+def migration(version, description):
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+@migration(1, 'Indexes on task hot-path columns')
+def _task_indexes(connection):
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_task_list_id ON task (list_id)'))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_task_list_id_status ON task (list_id, status)'))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_task_due_date ON task (due_date)'))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_task_status_due_date ON task (status, due_date)'))
+
+@migration(2, 'Full-text search tables and sync triggers')
+def _search_index(connection):
+    # FTS5 is SQLite specific, other databases use search.py's LIKE fallback
+    if search.is_supported(connection):
+        search.create_search_schema(connection)
+
+@migration(3, 'Revision columns for the change feed')
+def _revisions(connection):
+    # Fresh databases get the columns from create_all. Existing rows start at
+    # revision 1, so a first sync from since=0 returns them.
+    for table in ('task', 'list'):
+        if 'revision' not in {column['name'] for column in inspect(connection).get_columns(table)}:
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN revision INTEGER NOT NULL DEFAULT 0'))
+        connection.execute(text(f'UPDATE {table} SET revision = 1 WHERE revision = 0'))
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS ix_{table}_revision ON {table} (revision)'))
+    if connection.execute(text('SELECT count(*) FROM sync_state')).scalar() == 0:
+        connection.execute(text('INSERT INTO sync_state (id, revision, pruned_revision) VALUES (1, 1, 0)'))
+
+@migration(4, 'Heartbeat column for background jobs')
+def _job_heartbeat(connection):
+    if 'heartbeat_at' not in {column['name'] for column in inspect(connection).get_columns('job')}:
+        connection.execute(text('ALTER TABLE job ADD COLUMN heartbeat_at TIMESTAMP'))
+
+def _ensure_version_table(connection):
+    connection.execute(text('CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, description VARCHAR(255) NOT NULL, applied_at TIMESTAMP NOT NULL)'))
+
+def current_version():
+    with db.engine.begin() as connection:
+        _ensure_version_table(connection)
+        return connection.execute(text('SELECT coalesce(max(version), 0) FROM schema_migrations')).scalar()
+
+def upgrade():
+    # Creates missing tables, then applies every pending migration in its own transaction
+    db.create_all()
+    applied = []
+    version = current_version()
+    for migration_version, description, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if migration_version <= version:
+            continue
+        with db.engine.begin() as connection:
+            func(connection)
+            connection.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) VALUES (:version, :description, CURRENT_TIMESTAMP)'),
+                {'version': migration_version, 'description': description}
+            )
+        applied.append((migration_version, description))
+    return applied
+
+def explain_queries():
+    # The statements of the hot paths, built by the same functions the views use,
+    # and the index each should use
+    from app import lists_query, tasks_query, list_summaries_query, agenda_counts_query, agenda_bucket_query, export_query, LIST_FIELDS, TASK_FIELDS, AGENDA_BUCKETS
+    from changes import changed_rows_query, page_revisions_query
+    from serializers import TASK_SCHEMA
+    today = date.today()
+    cursor = [today.isoformat(), 1]
+    return [
+        ('list summaries', list_summaries_query(), 'ix_task_list_id'),
+        ('lists with counts', lists_query(LIST_FIELDS, cursor=[1]), 'ix_task_list_id'),
+        ('tasks by list', tasks_query(TASK_FIELDS, list_id=1), 'ix_task_list_id'),
+        ('open tasks by list', tasks_query(TASK_FIELDS, status=False, list_id=1), 'ix_task_list_id_status'),
+        ('tasks by due date', tasks_query(TASK_FIELDS, due_after=today, order='due_date', cursor=cursor), 'ix_task_due_date'),
+        ('open tasks by due date', tasks_query(TASK_FIELDS, status=False, due_before=today, order='due_date'), 'ix_task_status_due_date'),
+        ('agenda counts', agenda_counts_query(today), 'ix_task_status_due_date'),
+        *[(f'agenda {bucket}', agenda_bucket_query(bucket, today, cursor), 'ix_task_status_due_date') for bucket in AGENDA_BUCKETS],
+        ('tasks changed since a revision', changed_rows_query(Task, TASK_SCHEMA, 1, 2), 'ix_task_revision'),
+        ('changes page end in tasks', page_revisions_query(Task, 1, 2, 100), 'ix_task_revision'),
+        ('changes page end in lists', page_revisions_query(List, 1, 2, 100), 'ix_list_revision'),
+        ('changes page end in tombstones', page_revisions_query(Tombstone, 1, 2, 100), 'ix_tombstone_revision'),
+        ('export', export_query(), 'ix_task_list_id'),
+    ]
+
+def query_plan(connection, query):
+    sql = str(query.compile(connection.engine, compile_kwargs={'literal_binds': True}))
+    return ' | '.join(row[-1] for row in connection.execute(text('EXPLAIN QUERY PLAN ' + sql)))
+
+def check_indexes():
+    # Runs EXPLAIN QUERY PLAN for each hot-path query and reports whether the
+    # plan uses the expected index (any ix_task_list_id* index counts for list
+    # lookups) without sorting or grouping in a temporary B-tree
+    results = []
+    with db.engine.connect() as connection:
+        for name, query, index in explain_queries():
+            plan = query_plan(connection, query)
+            results.append((name, index, index in plan and 'TEMP B-TREE' not in plan, plan))
+    return results
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Create missing tables and apply pending schema migrations."""
+    applied = upgrade()
+    for version, description in applied:
+        click.echo(f"Applied migration {version}: {description}")
+    click.echo(f"Database is at schema version {current_version()}")
+
+@app.cli.command('db-check-indexes')
+def db_check_indexes_command():
+    """Verify with EXPLAIN QUERY PLAN that the hot-path queries use their indexes."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException("Index checks use EXPLAIN QUERY PLAN and only support SQLite")
+    failed = False
+    for name, index, ok, plan in check_indexes():
+        click.echo(f"{'ok  ' if ok else 'FAIL'} {name}: expected {index}, plan: {plan}")
+        failed = failed or not ok
+    if failed:
+        raise click.ClickException("Some queries do not use their indexes, run 'flask db-upgrade'")
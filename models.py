@@ -10,9 +10,21 @@ class Task(db.Model):
     # Foreign key to the List model
     list_id = db.Column(db.Integer, db.ForeignKey('list.id'), nullable=False)
 
+    # Revision of the last change, set by changes.py
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     # Relationship to the List model
     list = db.relationship('List', back_populates='tasks')
 
+    # Existing databases get these through migrations.py
+    __table_args__ = (
+        db.Index('ix_task_list_id', 'list_id'),
+        db.Index('ix_task_list_id_status', 'list_id', 'status'),
+        db.Index('ix_task_due_date', 'due_date'),
+        db.Index('ix_task_status_due_date', 'status', 'due_date'),
+        db.Index('ix_task_revision', 'revision'),
+    )
+
     def __repr__(self):
         return f'<Task {self.title}>'
 
@@ -21,13 +33,59 @@ class List(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(255), nullable=False)
     created_date = db.Column(db.Date, nullable=False)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationship to the Task model
     tasks = db.relationship('Task', back_populates='list', lazy='dynamic')
 
+    __table_args__ = (
+        db.Index('ix_list_revision', 'revision'),
+    )
+
     @property
     def task_count(self):
         return self.tasks.count()
 
     def __repr__(self):
-        return f'<List {self.title}>'
\ No newline at end of file
+        return f'<List {self.title}>'
+
+class Tombstone(db.Model):
+    # Deleted tasks and lists, so the change feed can report deletions
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # 'task' or 'list'
+    object_id = db.Column(db.Integer, nullable=False)
+    revision = db.Column(db.Integer, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<Tombstone {self.kind} {self.object_id}>'
+
+class SyncState(db.Model):
+    # A single row holding the last revision handed out and the newest revision
+    # whose tombstones were pruned
+    __tablename__ = 'sync_state'
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    pruned_revision = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    # Background import/export runs, see jobs.py
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    counts = db.Column(db.JSON, nullable=False, default=dict)
+    rows = db.Column(db.Integer, nullable=False, default=0)  # Lists and tasks processed so far
+    done = db.Column(db.Integer)   # done/total give the completed fraction, in job specific units
+    total = db.Column(db.Integer)
+    result = db.Column(db.JSON)
+    result_path = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # Touched by the process running the job, see jobs.py
+
+    def __repr__(self):
+        return f'<Job {self.kind} {self.id}>'
@@ -0,0 +1,101 @@
+from app import app, db
+from models import Task, List
+from serializers import serialize_rows, TASK_SCHEMA, LIST_SCHEMA
+from sqlalchemy import text, select, or_, func, table, column, literal_column
+import re
+import click
+
+# Full-text search over task titles and list titles/descriptions.
+#
+# On SQLite the data lives in external-content FTS5 tables (task_fts, list_fts)
+# created by migration 2. Triggers on task and list keep them in sync for every
+# write path, including the bulk Core inserts/updates of the importer, so no
+# application code has to remember to update the index. Results are ranked with
+# bm25, list titles weighing more than descriptions. Other databases fall back to
+# a LIKE search.
+
+SEARCH_TYPES = ('all', 'tasks', 'lists')
+TASK_FTS = table('task_fts', column('rowid'), column('rank'))
+LIST_FTS = table('list_fts', column('rowid'))
+
+SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(title, content='task', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS list_fts USING fts5(title, description, content='list', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts(rowid, title) VALUES (new.id, new.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_update AFTER UPDATE OF title ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO task_fts(rowid, title) VALUES (new.id, new.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS list_fts_insert AFTER INSERT ON list BEGIN
+        INSERT INTO list_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS list_fts_delete AFTER DELETE ON list BEGIN
+        INSERT INTO list_fts(list_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS list_fts_update AFTER UPDATE OF title, description ON list BEGIN
+        INSERT INTO list_fts(list_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO list_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+def is_supported(connection=None):
+    return (connection or db.engine).dialect.name == 'sqlite'
+
+def create_search_schema(connection):
+    for statement in SCHEMA:
+        connection.execute(text(statement))
+    rebuild_search_index(connection)
+
+def rebuild_search_index(connection):
+    # Re-reads every row from the content tables, for databases that were
+    # written to while the triggers were missing
+    connection.execute(text("INSERT INTO task_fts(task_fts) VALUES ('rebuild')"))
+    connection.execute(text("INSERT INTO list_fts(list_fts) VALUES ('rebuild')"))
+
+def match_query(query):
+    # Every word of the user's input must match, each as a prefix. Quoting the
+    # words keeps FTS5 operators and punctuation in the input from being parsed.
+    words = re.findall(r'\w+', query or '')
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_tasks(query, limit=20, offset=0):
+    columns = [getattr(Task, field) for field in TASK_SCHEMA]
+    if is_supported():
+        statement = (
+            select(*columns).select_from(TASK_FTS).join(Task, Task.id == TASK_FTS.c.rowid)
+            .where(literal_column('task_fts').op('MATCH')(match_query(query)))
+            .order_by(TASK_FTS.c.rank)
+        )
+    else:
+        statement = select(*columns).where(*[Task.title.ilike(f'%{word}%') for word in re.findall(r'\w+', query)]).order_by(Task.id)
+    return serialize_rows(db.session.execute(statement.limit(limit).offset(offset)), TASK_SCHEMA)
+
+def search_lists(query, limit=20, offset=0):
+    columns = [getattr(List, field) for field in LIST_SCHEMA]
+    if is_supported():
+        statement = (
+            select(*columns).select_from(LIST_FTS).join(List, List.id == LIST_FTS.c.rowid)
+            .where(literal_column('list_fts').op('MATCH')(match_query(query)))
+            .order_by(func.bm25(literal_column('list_fts'), 10.0, 1.0))
+        )
+    else:
+        statement = (
+            select(*columns)
+            .where(*[or_(List.title.ilike(f'%{word}%'), List.description.ilike(f'%{word}%')) for word in re.findall(r'\w+', query)])
+            .order_by(List.id)
+        )
+    return serialize_rows(db.session.execute(statement.limit(limit).offset(offset)), LIST_SCHEMA)
+
+@app.cli.command('search-rebuild')
+def search_rebuild_command():
+    """Rebuild the full-text search index from the task and list tables."""
+    if not is_supported():
+        raise click.ClickException("Full-text search indexes are only used on SQLite")
+    with db.engine.begin() as connection:
+        rebuild_search_index(connection)
+    click.echo("Search index rebuilt")
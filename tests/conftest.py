@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# The app reads its configuration from the environment when it is imported,
+# so point it at a throwaway SQLite file before any test module imports it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['CACHE_BACKEND'] = 'none'
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    from migrations import upgrade
+    with app.app_context():
+        upgrade()
+        yield app
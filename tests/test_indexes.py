@@ -0,0 +1,14 @@
+import pytest
+from migrations import explain_queries, query_plan
+
+@pytest.fixture
+def connection(app):
+    from app import db
+    with db.engine.connect() as connection:
+        yield connection
+
+@pytest.mark.parametrize('query, index', [pytest.param(query, index, id=name) for name, query, index in explain_queries()])
+def test_query_uses_index(connection, query, index):
+    plan = query_plan(connection, query)
+    assert index in plan
+    assert 'TEMP B-TREE' not in plan
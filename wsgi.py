@@ -0,0 +1,10 @@
+# wsgi.py
+#
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# Importing through this module (rather than running app.py directly) lets app.py
+# and models.py import each other in the right order.
+
+from app import app
+
+if __name__ == '__main__':
+    app.run(debug=True)